@@ -12,6 +12,7 @@ import shutil
 
 from .codeindexer import CodeIndexer
 from .llm_client import OllamaClient
+from .llm_cache import SemanticCache
 from .search_engine import SearchEngine
 from .database import Database
 
@@ -33,11 +34,11 @@ CORS(app, resources={
     }
 })
 
-# Initialize global objects
-indexer = CodeIndexer()
-llm_client = OllamaClient()
-search_engine = SearchEngine(llm_client=llm_client)
+# Initialize global objects; every indexer shares the one Database and its writer thread
 db = Database()
+indexer = CodeIndexer(db=db)
+llm_client = OllamaClient(semantic_cache=SemanticCache(encoder=indexer.vector_db.model), cache_path="llm_cache.db")
+search_engine = SearchEngine(llm_client=llm_client, embedding_cache_path="embedding_cache.npz")
 
 # Track the current indexing job
 indexing_status = {
@@ -74,6 +75,16 @@ def initialize_search_engine():
     else:
         logger.warning("No codebase content available for search engine initialization")
 
+def warm_file_summaries():
+    """Summarize the current codebase into the client's summary cache when there are no stored summaries to use."""
+    if indexer.repo_path and db.get_file_summaries(indexer.repo_path):
+        return
+    try:
+        logger.info("Warming file summaries")
+        llm_client.summarize_files([{'path': path, 'content': content} for path, content in indexer.file_contents.items()])
+    except Exception as e:
+        logger.error(f"Error warming file summaries: {str(e)}")
+
 @app.route('/api/test-ollama', methods=['POST', 'OPTIONS'])
 def test_ollama():
     """Test connection to Ollama server."""
@@ -136,11 +147,8 @@ def load_repository():
         if not repo_url:
             return jsonify({"success": False, "error": "No repository URL provided"})
         
-        # Create a temporary directory for the repository
+        # Temporary directory for the repository (an existing clone is refreshed by the indexer)
         repo_path = os.path.join(tempfile.gettempdir(), 'querycodegenie_repo')
-        if os.path.exists(repo_path):
-            shutil.rmtree(repo_path)
-        os.makedirs(repo_path)
         
         # Update indexing status to show loading
         db.update_indexing_status(
@@ -171,6 +179,7 @@ def load_repository():
                         is_loading=False,
                         repo_url=repo_url
                     )
+                    warm_file_summaries()
                 else:
                     db.update_indexing_status(
                         total_files=0,
@@ -224,7 +233,7 @@ def load_directory():
         return jsonify({"success": False, "error": f"Directory does not exist: {directory_path}"})
     
     # Check if directory is already indexed
-    status = db.get_indexing_status(directory_path)
+    status = db.get_progress(directory_path)
     if status and status.get("success_rate", 0) > 95:
         indexing_status.update({
             "is_complete": True,
@@ -241,7 +250,7 @@ def load_directory():
     
     # Reset indexer with new path
     global indexer
-    indexer = CodeIndexer()
+    indexer = CodeIndexer(db=db)
     
     # Start indexing in a background thread
     def index_directory_task():
@@ -289,8 +298,9 @@ def load_directory():
                 "success_rate": result["stats"]["success_rate"],
                 "is_loading": False
             })
-            # Initialize search engine after successful indexing
+            # Initialize search engine after successful indexing, then summarize files for suggest-changes
             initialize_search_engine()
+            warm_file_summaries()
         else:
             indexing_status.update({
                 "is_complete": False,
@@ -545,7 +555,15 @@ def suggest_code_changes():
     
     # Process similar to query_code but use suggest_code_changes method
     file_list = list(indexer.file_contents.keys())
-    file_summaries = {path: content[:500] + "..." for path, content in indexer.file_contents.items()}
+    
+    # Prefer the stored summaries of the current repository; otherwise use the summaries warmed in the background
+    # after indexing, with a preview of each file not summarized yet, so the request never waits on the model
+    file_summaries = db.get_file_summaries(indexer.repo_path) if indexer.repo_path else {}
+    if not file_summaries:
+        cached = llm_client.summarize_files(
+            [{'path': path, 'content': content} for path, content in indexer.file_contents.items()], cached_only=True
+        )
+        file_summaries = {path: cached.get(path) or content[:500] + "..." for path, content in indexer.file_contents.items()}
     
     relevant_files_response = llm_client.find_relevant_files(query, file_list, file_summaries)
     
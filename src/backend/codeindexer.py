@@ -11,22 +11,191 @@ from .database import Database
 from .vector_db import VectorDB
 import concurrent.futures
 import time
+import threading
 from .llm_client import OllamaClient
 from tree_sitter import Language, Parser
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
+import heapq
+from operator import itemgetter
+from functools import lru_cache
+from types import MappingProxyType
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# File extension to language mapping (read-only so cached lookups stay valid)
+FILE_EXTENSION_TO_LANGUAGE = MappingProxyType({
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp',
+    '.c': 'c',
+    '.h': 'cpp',
+    '.hpp': 'cpp',
+    '.cs': 'csharp',
+    '.go': 'go',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.rs': 'rust',
+    '.r': 'r',
+    '.m': 'matlab',
+    '.sh': 'shell',
+    '.bash': 'shell',
+    '.zsh': 'shell',
+    '.sql': 'sql',
+    '.html': 'html',
+    '.css': 'css',
+    '.scss': 'scss',
+    '.less': 'less',
+    '.vue': 'vue',
+    '.svelte': 'svelte',
+    '.clj': 'clojure',
+    '.fs': 'fsharp',
+    '.pl': 'perl',
+    '.lua': 'lua',
+})
+
+# Tree-sitter node types that represent methods, per language
+METHOD_NODE_TYPES: Dict[str, Tuple[str, ...]] = {
+    'python': ('function_definition', 'method_definition'),
+    'javascript': ('function_declaration', 'method_definition', 'arrow_function'),
+    'typescript': ('function_declaration', 'method_definition', 'arrow_function'),
+    'java': ('method_declaration',),
+    'cpp': ('function_definition', 'method_definition'),
+    'csharp': ('method_declaration',),
+    'go': ('method_declaration', 'function_declaration'),
+    'ruby': ('method', 'singleton_method'),
+    'php': ('method_declaration',),
+    'swift': ('function_declaration', 'method_declaration'),
+    'kotlin': ('function_declaration', 'method_declaration'),
+    'scala': ('function_declaration', 'method_declaration'),
+    'rust': ('function_item', 'impl_item'),
+    'r': ('function_definition',),
+    'matlab': ('function_definition',),
+    'shell': ('function_definition',),
+    'sql': ('function_definition',),
+    'vue': ('method_definition',),
+    'svelte': ('method_definition',),
+    'clojure': ('function_definition',),
+    'fsharp': ('function_definition',),
+    'perl': ('function_definition',),
+    'lua': ('function_definition',),
+}
+
+# Tree-sitter node types that represent imports, per language
+IMPORT_NODE_TYPES: Dict[str, Tuple[str, ...]] = {
+    'python': ('import_statement', 'import_from_statement'),
+    'javascript': ('import_statement', 'import_declaration'),
+    'typescript': ('import_statement', 'import_declaration'),
+    'java': ('import_declaration',),
+    'cpp': ('preproc_include',),
+    'csharp': ('using_directive',),
+    'go': ('import_spec', 'import_declaration'),
+    'ruby': ('require', 'require_relative'),
+    'php': ('use_declaration',),
+    'swift': ('import_declaration',),
+    'kotlin': ('import_directive',),
+    'scala': ('import_declaration',),
+    'rust': ('use_declaration',),
+    'r': ('library', 'require'),
+    'matlab': ('import',),
+    'shell': ('source',),
+    'sql': ('import',),
+    'vue': ('import_statement',),
+    'svelte': ('import_statement',),
+    'clojure': ('require', 'use'),
+    'fsharp': ('open',),
+    'perl': ('use', 'require'),
+    'lua': ('require',),
+}
+
+# File names that mark an entry point, per language
+ENTRY_POINTS: Dict[str, Tuple[str, ...]] = {
+    'python': ('main.py', '__main__.py', 'app.py', 'manage.py', 'wsgi.py', 'asgi.py'),
+    'javascript': ('index.js', 'app.js', 'main.js', 'server.js'),
+    'typescript': ('index.ts', 'app.ts', 'main.ts', 'server.ts'),
+    'java': ('Main.java', 'Application.java'),
+    'cpp': ('main.cpp', 'app.cpp'),
+    'csharp': ('Program.cs', 'Startup.cs'),
+    'go': ('main.go',),
+    'rust': ('main.rs', 'lib.rs'),
+    'ruby': ('app.rb', 'config.ru'),
+    'php': ('index.php', 'app.php'),
+    'swift': ('main.swift', 'App.swift'),
+    'kotlin': ('Main.kt', 'Application.kt'),
+    'scala': ('Main.scala', 'App.scala'),
+    'r': ('main.R', 'app.R'),
+    'matlab': ('main.m', 'app.m'),
+    'shell': ('main.sh', 'run.sh'),
+    'sql': ('main.sql', 'init.sql'),
+    'vue': ('main.js', 'app.js'),
+    'svelte': ('main.js', 'app.js'),
+    'clojure': ('main.clj', 'app.clj'),
+    'fsharp': ('Program.fs', 'App.fs'),
+    'perl': ('main.pl', 'app.pl'),
+    'lua': ('main.lua', 'app.lua'),
+}
+
+# Path fragments that mark a core file (shared by every language)
+CORE_PATTERNS = frozenset({'core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'})
+
+# Tree-sitter languages are built and loaded once per process and shared by every indexer
+_LANGUAGES: Dict[str, Language] = {}
+_LANGUAGES_LOCK = threading.Lock()
+
+# Node type tables backing the compiled tree-sitter queries
+QUERY_NODE_TYPES = {
+    'method': METHOD_NODE_TYPES,
+    'import': IMPORT_NODE_TYPES,
+}
+
+@lru_cache(maxsize=None)
+def _build_query(language: str, kind: str) -> Optional[Any]:
+    """Compile (once) a tree-sitter query capturing every method or import node for a loaded language."""
+    ts_language = _LANGUAGES[language]
+    patterns = []
+    for node_type in QUERY_NODE_TYPES[kind].get(language, ()):
+        pattern = f"({node_type}) @{kind}"
+        try:
+            ts_language.query(pattern)
+        except Exception:
+            # Not every grammar defines every node type in the table
+            continue
+        patterns.append(pattern)
+    return ts_language.query("\n".join(patterns)) if patterns else None
+
+# Bytes considered text when sniffing for binary content
+TEXT_CHARS = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+@lru_cache(maxsize=64)
+def _language_for_extension(ext: str) -> str:
+    """Map a lowercase file extension to its language."""
+    return FILE_EXTENSION_TO_LANGUAGE.get(ext, 'unknown')
+
+@lru_cache(maxsize=1024)
+def _is_entry_point_name(file_name: str, file_type: str) -> bool:
+    """Check if a file name is an entry point for its language."""
+    return file_name in ENTRY_POINTS.get(file_type, ())
+
+@lru_cache(maxsize=1024)
+def _has_core_pattern(name: str) -> bool:
+    """Check if a lowercase file or directory name contains a core pattern."""
+    return any(pattern in name for pattern in CORE_PATTERNS)
+
 class CodeIndexer:
-    def __init__(self, base_dir: str = None):
+    def __init__(self, base_dir: str = None, db: Optional[Database] = None):
         self.base_dir = base_dir or tempfile.mkdtemp()
         self.file_contents: Dict[str, str] = {}
+        self.repo_path: Optional[str] = None  # root of the repository last passed to index_files
         self.file_language: Dict[str, str] = {}
-        self.file_summaries: Dict[str, str] = {}
-        self.file_methods: Dict[str, List[Dict[str, Any]]] = {}
         self.imports_map: Dict[str, Set[str]] = {}
         self.exports_map: Dict[str, Set[str]] = {}
         self.references_map: Dict[str, Set[str]] = {}
@@ -34,10 +203,11 @@ class CodeIndexer:
         self.llm_client = OllamaClient(model="llama3:8b")
         self.parser = Parser()
         self.vector_db = VectorDB()
-        self.db = Database()
+        self.db = db or Database()  # shared by indexers over the same codebase.db, so each doesn't start a writer thread
         
-        # Initialize search engine
-        self.search_engine = VectorDB()
+        # Initialize search engine in its own directory; stores sharing one would replay and truncate each other's
+        # unflushed rows
+        self.search_engine = VectorDB(db_path="search_index")
         
         # Initialize logging
         self.logger = logging.getLogger(__name__)
@@ -46,43 +216,13 @@ class CodeIndexer:
         self.languages = {}
         self._init_tree_sitter_languages()
         
+        # Compile method/import queries up front so the first file doesn't pay for it
+        for language in self.languages:
+            for kind in QUERY_NODE_TYPES:
+                _build_query(language, kind)
+        
         # File extension to language mapping
-        self.file_extension_to_language = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.jsx': 'javascript',
-            '.ts': 'typescript',
-            '.tsx': 'typescript',
-            '.java': 'java',
-            '.cpp': 'cpp',
-            '.c': 'c',
-            '.h': 'cpp',
-            '.hpp': 'cpp',
-            '.cs': 'csharp',
-            '.go': 'go',
-            '.rb': 'ruby',
-            '.php': 'php',
-            '.swift': 'swift',
-            '.kt': 'kotlin',
-            '.scala': 'scala',
-            '.rs': 'rust',
-            '.r': 'r',
-            '.m': 'matlab',
-            '.sh': 'shell',
-            '.bash': 'shell',
-            '.zsh': 'shell',
-            '.sql': 'sql',
-            '.html': 'html',
-            '.css': 'css',
-            '.scss': 'scss',
-            '.less': 'less',
-            '.vue': 'vue',
-            '.svelte': 'svelte',
-            '.clj': 'clojure',
-            '.fs': 'fsharp',
-            '.pl': 'perl',
-            '.lua': 'lua',
-        }
+        self.file_extension_to_language = FILE_EXTENSION_TO_LANGUAGE
         
         # Binary file extensions to skip
         self.binary_extensions = {
@@ -139,19 +279,23 @@ class CodeIndexer:
             
             for lang, repo in languages.items():
                 try:
-                    lang_dir = os.path.join(grammar_dir, f'tree-sitter-{lang}')
-                    if not os.path.exists(lang_dir):
-                        subprocess.run(['git', 'clone', repo, lang_dir], check=True)
-                    
-                    # Build the language
-                    Language.build_library(
-                        os.path.join(grammar_dir, f'{lang}.so'),
-                        [lang_dir]
-                    )
+                    with _LANGUAGES_LOCK:
+                        if lang not in _LANGUAGES:
+                            lang_dir = os.path.join(grammar_dir, f'tree-sitter-{lang}')
+                            if not os.path.exists(lang_dir):
+                                subprocess.run(['git', 'clone', repo, lang_dir], check=True)
+                            
+                            # Build the language
+                            Language.build_library(
+                                os.path.join(grammar_dir, f'{lang}.so'),
+                                [lang_dir]
+                            )
+                            
+                            # Load the language
+                            _LANGUAGES[lang] = Language(os.path.join(grammar_dir, f'{lang}.so'), lang)
+                            logger.info(f"Successfully initialized tree-sitter for {lang}")
                     
-                    # Load the language
-                    self.languages[lang] = Language(os.path.join(grammar_dir, f'{lang}.so'), lang)
-                    logger.info(f"Successfully initialized tree-sitter for {lang}")
+                    self.languages[lang] = _LANGUAGES[lang]
                 except Exception as e:
                     logger.error(f"Failed to initialize tree-sitter for {lang}: {str(e)}")
         except Exception as e:
@@ -171,8 +315,7 @@ class CodeIndexer:
     
     def detect_language(self, file_path: str) -> str:
         """Detect programming language based on file extension."""
-        ext = os.path.splitext(file_path)[1].lower()
-        return self.file_extension_to_language.get(ext, 'unknown')
+        return _language_for_extension(os.path.splitext(file_path)[1].lower())
     
     def clone_repository(self, repo_url: str, auth_token: Optional[str] = None) -> Tuple[bool, str]:
         """Clone a Git repository to the base directory."""
@@ -224,6 +367,9 @@ class CodeIndexer:
     def index_files(self, repo_path: str) -> bool:
         """Index all files in the repository."""
         try:
+            # Remember which repository is current so queries only see its files
+            self.repo_path = repo_path
+            
             # Get current indexing status
             current_status = self.db.get_indexing_status()
             
@@ -257,107 +403,117 @@ class CodeIndexer:
                 repo_url=repo_path
             )
             
-            # Process each file
-            for file_path in all_files:
-                try:
-                    # Skip if already indexed
-                    if file_path in indexed_files:
-                        self.logger.info(f"Skipping already indexed file: {file_path}")
-                        continue
-                    
-                    # Process file
-                    file_info = self._process_file(file_path)
-                    
-                    if file_info:
-                        # Update file type and language counts
-                        file_type = os.path.splitext(file_path)[1]
-                        file_types[file_type] = file_types.get(file_type, 0) + 1
-                        languages[file_info['language']] = languages.get(file_info['language'], 0) + 1
+            # Stored hashes for every file, fetched once instead of queried per file
+            stored_hashes = self.db.current_hashes()
+            
+            # Process each file, batching database writes into larger transactions
+            with self.db.bulk():
+                for file_path in all_files:
+                    try:
+                        # Skip if already indexed
+                        if file_path in indexed_files:
+                            self.logger.info(f"Skipping already indexed file: {file_path}")
+                            continue
                         
-                        # Save to database
-                        self.db.save_file(
-                            file_path=file_info['file_path'],
-                            language=file_info['language'],
-                            file_hash=file_info['file_hash'],
-                            summary=file_info['summary'],
-                            detailed_summary=file_info['detailed_summary'],
-                            is_entry_point=file_info['is_entry_point'],
-                            is_core_file=file_info['is_core_file']
-                        )
+                        # Process file
+                        file_info = self._process_file(file_path, known_hash=stored_hashes.get(file_path))
                         
-                        # Save methods
-                        for method in file_info['methods']:
-                            self.db.save_method(
+                        # Skip re-saving if the stored copy is up to date, but still count it as indexed
+                        if file_info and file_info.get('unchanged'):
+                            self.logger.info(f"Skipping unchanged file: {file_path}")
+                            indexed_files.append(file_path)
+                        elif file_info:
+                            # Update file type and language counts
+                            file_type = os.path.splitext(file_path)[1]
+                            file_types[file_type] = file_types.get(file_type, 0) + 1
+                            languages[file_info['language']] = languages.get(file_info['language'], 0) + 1
+                            
+                            # Save to database
+                            self.db.save_file(
                                 file_path=file_info['file_path'],
-                                method_name=method['name'],
-                                method_type=method['type'],
-                                line_numbers=method['line_numbers'],
-                                summary=method['summary']
+                                language=file_info['language'],
+                                file_hash=file_info['file_hash'],
+                                summary=file_info['summary'],
+                                detailed_summary=file_info['detailed_summary'],
+                                is_entry_point=file_info['is_entry_point'],
+                                is_core_file=file_info['is_core_file']
                             )
+                            
+                            # Save methods
+                            for method in file_info['methods']:
+                                self.db.save_method(
+                                    file_path=file_info['file_path'],
+                                    method_name=method['name'],
+                                    method_type=method['type'],
+                                    line_numbers=method['line_numbers'],
+                                    summary=method['summary']
+                                )
+                            
+                            indexed_files.append(file_path)
+                            
+                            # Add the file and its methods to the search engine in one batch
+                            documents = [{
+                                'file_path': file_info['file_path'],
+                                'content': file_info['content'],
+                                'metadata': {
+                                    'language': file_info['language'],
+                                    'summary': file_info['summary'],
+                                    'detailed_summary': file_info['detailed_summary'],
+                                    'is_entry_point': file_info['is_entry_point'],
+                                    'is_core_file': file_info['is_core_file']
+                                }
+                            }]
+                            for method in file_info['methods']:
+                                documents.append({
+                                    'file_path': file_info['file_path'],
+                                    'content': method['body'],
+                                    'metadata': {
+                                        'type': 'method',
+                                        'name': method['name'],
+                                        'line_numbers': method['line_numbers'],
+                                        'summary': method['summary']
+                                    }
+                                })
+                            self.search_engine.add_documents_bulk(documents)
+                        else:
+                            failed_files += 1
+                            failed_files_details.append({
+                                'file_path': file_path,
+                                'error': 'Processing failed'
+                            })
                         
-                        indexed_files.append(file_path)
+                        processed_files += 1
                         
-                        # Add to search engine
-                        self.search_engine.add_document(
-                            file_path=file_info['file_path'],
-                            content=file_info['content'],
-                            metadata={
-                                'language': file_info['language'],
-                                'summary': file_info['summary'],
-                                'detailed_summary': file_info['detailed_summary'],
-                                'is_entry_point': file_info['is_entry_point'],
-                                'is_core_file': file_info['is_core_file']
-                            }
+                        # Update progress every file
+                        success_rate = (processed_files - failed_files) / processed_files if processed_files > 0 else 0.0
+                        
+                        self.db.update_indexing_status(
+                            total_files=total_files,
+                            processed_files=processed_files,
+                            failed_files=failed_files,
+                            success_rate=success_rate,
+                            file_types=file_types,
+                            languages=languages,
+                            indexed_files=indexed_files,
+                            failed_files_details=failed_files_details,
+                            is_complete=(processed_files == total_files),
+                            is_loading=(processed_files < total_files),
+                            repo_url=repo_path
                         )
                         
-                        # Add methods to search engine
-                        for method in file_info['methods']:
-                            self.search_engine.add_document(
-                                file_path=file_info['file_path'],
-                                content=method['body'],
-                                metadata={
-                                    'type': 'method',
-                                    'name': method['name'],
-                                    'line_numbers': method['line_numbers'],
-                                    'summary': method['summary']
-                                }
-                            )
-                    else:
+                        self.logger.info(f"Processed {processed_files}/{total_files} files")
+                    
+                    except Exception as e:
+                        self.logger.error(f"Error processing file {file_path}: {str(e)}")
                         failed_files += 1
                         failed_files_details.append({
                             'file_path': file_path,
-                            'error': 'Processing failed'
+                            'error': str(e)
                         })
-                    
-                    processed_files += 1
-                    
-                    # Update progress every file
-                    success_rate = (processed_files - failed_files) / processed_files if processed_files > 0 else 0.0
-                    
-                    self.db.update_indexing_status(
-                        total_files=total_files,
-                        processed_files=processed_files,
-                        failed_files=failed_files,
-                        success_rate=success_rate,
-                        file_types=file_types,
-                        languages=languages,
-                        indexed_files=indexed_files,
-                        failed_files_details=failed_files_details,
-                        is_complete=(processed_files == total_files),
-                        is_loading=(processed_files < total_files),
-                        repo_url=repo_path
-                    )
-                    
-                    self.logger.info(f"Processed {processed_files}/{total_files} files")
-                
-                except Exception as e:
-                    self.logger.error(f"Error processing file {file_path}: {str(e)}")
-                    failed_files += 1
-                    failed_files_details.append({
-                        'file_path': file_path,
-                        'error': str(e)
-                    })
-                    processed_files += 1
+                        processed_files += 1
+            
+            # Write out vectors still below the flush threshold
+            self.search_engine.flush()
             
             # Final status update
             success_rate = (processed_files - failed_files) / processed_files if processed_files > 0 else 0.0
@@ -526,10 +682,6 @@ class CodeIndexer:
                         # Extract method body
                         method_body = '\n'.join(lines[body_start:body_end + 1])
                         
-                        # Generate method summary using LLM
-                        method_prompt = f"Please provide a concise summary of this {language} method:\n\n{method_body}"
-                        method_summary = self.llm_client.generate(method_prompt)
-                        
                         # Get line numbers
                         line_numbers = {
                             'start': body_start + 1,
@@ -541,7 +693,7 @@ class CodeIndexer:
                             'type': method_type,
                             'body': method_body,
                             'parameters': params.split(','),
-                            'summary': method_summary,
+                            'summary': '',
                             'line_numbers': line_numbers
                         })
             
@@ -702,8 +854,11 @@ Detailed summary:"""
             self.logger.error(f"Error generating detailed summary: {str(e)}")
             return "Detailed summary generation failed"
     
-    def _process_file(self, file_path: str) -> Dict[str, Any]:
-        """Process a single file and extract its metadata."""
+    def _process_file(self, file_path: str, known_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Process a single file and extract its metadata.
+        
+        If the file's hash equals known_hash, returns early with 'unchanged' set instead of re-summarizing it.
+        """
         try:
             # Check if file exists and is readable
             if not os.path.exists(file_path):
@@ -730,10 +885,14 @@ Detailed summary:"""
                 self.logger.warning(f"Could not detect language for file: {file_path}")
                 return None
 
-            # Read file content
+            # Read file content as raw bytes so it can be hashed without re-encoding
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                with open(file_path, 'rb') as f:
+                    raw_content = f.read()
+                content = raw_content.decode('utf-8')
+                if '\r' in content:
+                    # Match text-mode universal newline handling
+                    content = content.replace('\r\n', '\n').replace('\r', '\n')
             except UnicodeDecodeError:
                 self.logger.warning(f"Could not decode file as UTF-8: {file_path}")
                 return None
@@ -741,6 +900,11 @@ Detailed summary:"""
                 self.logger.warning(f"Error reading file {file_path}: {str(e)}")
                 return None
 
+            # Calculate file hash, and stop here if the stored copy is current
+            file_hash = self._calculate_file_hash(raw_content)
+            if file_hash == known_hash:
+                return {'file_path': file_path, 'file_hash': file_hash, 'unchanged': True}
+
             # Generate summaries
             try:
                 summary = self._generate_summary(content, language)
@@ -750,10 +914,11 @@ Detailed summary:"""
                 summary = "Summary generation failed"
                 detailed_summary = "Detailed summary generation failed"
 
-            # Extract imports and methods
+            # Extract imports and methods, sharing a single tree-sitter parse
             try:
-                imports = self._extract_imports(content, language)
-                methods = self._extract_methods(content, language)
+                tree = self._parse_with_tree_sitter(content, language) if language in self.languages else None
+                imports = self._extract_imports(content, language, tree=tree)
+                methods = self._extract_methods(content, language, tree=tree)
             except Exception as e:
                 self.logger.warning(f"Error extracting imports/methods for {file_path}: {str(e)}")
                 imports = []
@@ -763,13 +928,6 @@ Detailed summary:"""
             is_entry_point = self._is_entry_point(file_path)
             is_core_file = self._is_core_file(file_path)
 
-            # Calculate file hash
-            file_hash = self._calculate_file_hash(content)
-
-            # Store summaries and methods
-            self.file_summaries[file_path] = summary
-            self.file_methods[file_path] = methods
-
             return {
                 'file_path': file_path,
                 'language': language,
@@ -800,45 +958,17 @@ Detailed summary:"""
             logger.error(f"Error parsing file with tree-sitter: {str(e)}")
             return None
 
-    def _extract_methods_with_tree_sitter(self, tree: Any, language: str) -> List[Dict[str, Any]]:
-        """Extract methods using tree-sitter AST."""
+    def _extract_methods_with_tree_sitter(self, tree: Any, source: bytes, language: str) -> List[Dict[str, Any]]:
+        """Extract methods using tree-sitter AST; source is the UTF-8 text the tree was parsed from."""
         try:
             methods = []
             
             # Get the root node
             root_node = tree.root_node
             
-            # Define method node types based on language
-            method_types = {
-                'python': ['function_definition', 'method_definition'],
-                'javascript': ['function_declaration', 'method_definition', 'arrow_function'],
-                'typescript': ['function_declaration', 'method_definition', 'arrow_function'],
-                'java': ['method_declaration'],
-                'cpp': ['function_definition', 'method_definition'],
-                'csharp': ['method_declaration'],
-                'go': ['method_declaration', 'function_declaration'],
-                'ruby': ['method', 'singleton_method'],
-                'php': ['method_declaration'],
-                'swift': ['function_declaration', 'method_declaration'],
-                'kotlin': ['function_declaration', 'method_declaration'],
-                'scala': ['function_declaration', 'method_declaration'],
-                'rust': ['function_item', 'impl_item'],
-                'r': ['function_definition'],
-                'matlab': ['function_definition'],
-                'shell': ['function_definition'],
-                'sql': ['function_definition'],
-                'vue': ['method_definition'],
-                'svelte': ['method_definition'],
-                'clojure': ['function_definition'],
-                'fsharp': ['function_definition'],
-                'perl': ['function_definition'],
-                'lua': ['function_definition']
-            }
-            
-            # Get method nodes
-            method_nodes = []
-            for node_type in method_types.get(language, []):
-                method_nodes.extend(root_node.children_by_field_name(node_type))
+            # Get method nodes anywhere in the tree using the precompiled query
+            query = _build_query(language, 'method')
+            method_nodes = [node for node, _ in query.captures(root_node)] if query else []
             
             # Process each method node
             for node in method_nodes:
@@ -847,14 +977,14 @@ Detailed summary:"""
                 if not name_node:
                     continue
                 
-                method_name = content[name_node.start_byte:name_node.end_byte]
+                method_name = source[name_node.start_byte:name_node.end_byte].decode('utf8')
                 
                 # Get method body
                 body_node = node.child_by_field_name('body')
                 if not body_node:
                     continue
                 
-                method_body = content[body_node.start_byte:body_node.end_byte]
+                method_body = source[body_node.start_byte:body_node.end_byte].decode('utf8')
                 
                 # Get method parameters
                 params_node = node.child_by_field_name('parameters')
@@ -862,13 +992,9 @@ Detailed summary:"""
                 if params_node:
                     for param_node in params_node.children:
                         if param_node.type == 'parameter':
-                            param_name = content[param_node.start_byte:param_node.end_byte]
+                            param_name = source[param_node.start_byte:param_node.end_byte].decode('utf8')
                             params.append(param_name)
                 
-                # Generate method summary using LLM
-                method_prompt = f"Please provide a concise summary of this {language} method:\n\n{method_body}"
-                method_summary = self.llm_client.generate(method_prompt)
-                
                 # Get line numbers
                 line_numbers = {
                     'start': node.start_point[0] + 1,
@@ -880,7 +1006,7 @@ Detailed summary:"""
                     'type': node.type,
                     'body': method_body,
                     'parameters': params,
-                    'summary': method_summary,
+                    'summary': '',
                     'line_numbers': line_numbers
                 })
             
@@ -890,43 +1016,15 @@ Detailed summary:"""
             self.logger.error(f"Error extracting methods with tree-sitter: {str(e)}")
             return []
 
-    def _extract_imports_with_tree_sitter(self, tree: Any, language: str) -> List[str]:
-        """Extract imports using tree-sitter AST."""
+    def _extract_imports_with_tree_sitter(self, tree: Any, source: bytes, language: str) -> List[str]:
+        """Extract imports using tree-sitter AST; source is the UTF-8 text the tree was parsed from."""
         try:
             imports = []
             root_node = tree.root_node
             
-            # Define import node types based on language
-            import_types = {
-                'python': ['import_statement', 'import_from_statement'],
-                'javascript': ['import_statement', 'import_declaration'],
-                'typescript': ['import_statement', 'import_declaration'],
-                'java': ['import_declaration'],
-                'cpp': ['preproc_include'],
-                'csharp': ['using_directive'],
-                'go': ['import_spec', 'import_declaration'],
-                'ruby': ['require', 'require_relative'],
-                'php': ['use_declaration'],
-                'swift': ['import_declaration'],
-                'kotlin': ['import_directive'],
-                'scala': ['import_declaration'],
-                'rust': ['use_declaration'],
-                'r': ['library', 'require'],
-                'matlab': ['import'],
-                'shell': ['source'],
-                'sql': ['import'],
-                'vue': ['import_statement'],
-                'svelte': ['import_statement'],
-                'clojure': ['require', 'use'],
-                'fsharp': ['open'],
-                'perl': ['use', 'require'],
-                'lua': ['require']
-            }
-            
-            # Get import nodes
-            import_nodes = []
-            for node_type in import_types.get(language, []):
-                import_nodes.extend(root_node.children_by_field_name(node_type))
+            # Get import nodes anywhere in the tree using the precompiled query
+            query = _build_query(language, 'import')
+            import_nodes = [node for node, _ in query.captures(root_node)] if query else []
             
             # Process each import node
             for node in import_nodes:
@@ -935,7 +1033,7 @@ Detailed summary:"""
                 if not path_node:
                     continue
                 
-                import_path = content[path_node.start_byte:path_node.end_byte]
+                import_path = source[path_node.start_byte:path_node.end_byte].decode('utf8')
                 
                 # Clean up import path
                 import_path = import_path.strip('"\'').strip()
@@ -949,11 +1047,11 @@ Detailed summary:"""
             self.logger.error(f"Error extracting imports with tree-sitter: {str(e)}")
             return []
 
-    def search_codebase(self, query: str) -> List[Dict[str, any]]:
+    def search_codebase(self, query: str, k: int = 5) -> List[Dict[str, any]]:
         """Search the codebase using vector similarity."""
         try:
             # Search vector database
-            results = self.vector_db.search(query)
+            results = self.vector_db.search(query, k=k)
             
             # Group results by file
             file_results = {}
@@ -976,14 +1074,8 @@ Detailed summary:"""
                         'relevance_score': result['relevance_score']
                     })
             
-            # Sort files by relevance score
-            sorted_files = sorted(
-                file_results.values(),
-                key=lambda x: x['relevance_score'],
-                reverse=True
-            )
-            
-            return sorted_files
+            # Select the top-k files by relevance score without a full sort
+            return heapq.nlargest(k, file_results.values(), key=itemgetter('relevance_score'))
             
         except Exception as e:
             logger.error(f"Error searching codebase: {str(e)}")
@@ -993,6 +1085,15 @@ Detailed summary:"""
         """Get file content and metadata from vector database."""
         return self.vector_db.get_file_content(file_path)
 
+    def get_file_summary(self, file_path: str) -> Optional[str]:
+        """Get the stored summary for an indexed file."""
+        metadata = self.db.get_file_metadata(file_path)
+        return metadata['summary'] if metadata else None
+
+    def get_file_methods(self, file_path: str) -> List[Dict[str, Any]]:
+        """Get the stored methods for an indexed file."""
+        return self.db.get_file_methods(file_path)
+
     def get_file_structure(self) -> Dict[str, Dict]:
         """Return the file structure of the indexed codebase as a tree."""
         if not self.indexed:
@@ -1000,22 +1101,33 @@ Detailed summary:"""
         
         root = {}
         
+        # Children dicts along the previous path; sorted paths share leading directories,
+        # so only the segments after the common prefix need to be walked
+        stack = [root]
+        prev_dirs: List[str] = []
+        
         for file_path in sorted(self.file_contents.keys()):
-            parts = file_path.split('/')
-            current = root
-            
-            # Build the tree structure
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:  # Leaf node (file)
-                    current[part] = {
-                        "type": "file",
-                        "language": self.file_language.get(file_path, "unknown"),
-                        "path": file_path
-                    }
-                else:  # Directory
-                    if part not in current:
-                        current[part] = {"type": "directory", "children": {}}
-                    current = current[part]["children"]
+            *dirs, name = file_path.split('/')
+            
+            common = 0
+            for prev_part, part in zip(prev_dirs, dirs):
+                if prev_part != part:
+                    break
+                common += 1
+            del stack[common + 1:]
+            
+            # Directories
+            for part in dirs[common:]:
+                node = stack[-1].setdefault(part, {"type": "directory", "children": {}})
+                stack.append(node["children"])
+            
+            # Leaf node (file)
+            stack[-1][name] = {
+                "type": "file",
+                "language": self.file_language.get(file_path, "unknown"),
+                "path": file_path
+            }
+            prev_dirs = dirs
         
         return {"root": root}
 
@@ -1092,8 +1204,7 @@ Detailed summary:"""
 
     def _get_file_type(self, file_path: str) -> str:
         """Get the file type based on extension."""
-        ext = os.path.splitext(file_path)[1].lower()
-        return self.file_extension_to_language.get(ext, 'unknown')
+        return self.detect_language(file_path)
 
     def _is_entry_point(self, file_path: str) -> bool:
         """Determine if a file is an entry point."""
@@ -1101,38 +1212,11 @@ Detailed summary:"""
             # Get file type from extension
             file_type = self.detect_language(file_path)
             
-            # Define entry point patterns for different languages
-            entry_point_patterns = {
-                'python': ['main.py', '__main__.py', 'app.py', 'manage.py', 'wsgi.py', 'asgi.py'],
-                'javascript': ['index.js', 'app.js', 'main.js', 'server.js'],
-                'typescript': ['index.ts', 'app.ts', 'main.ts', 'server.ts'],
-                'java': ['Main.java', 'Application.java'],
-                'cpp': ['main.cpp', 'app.cpp'],
-                'csharp': ['Program.cs', 'Startup.cs'],
-                'go': ['main.go'],
-                'rust': ['main.rs', 'lib.rs'],
-                'ruby': ['app.rb', 'config.ru'],
-                'php': ['index.php', 'app.php'],
-                'swift': ['main.swift', 'App.swift'],
-                'kotlin': ['Main.kt', 'Application.kt'],
-                'scala': ['Main.scala', 'App.scala'],
-                'r': ['main.R', 'app.R'],
-                'matlab': ['main.m', 'app.m'],
-                'shell': ['main.sh', 'run.sh'],
-                'sql': ['main.sql', 'init.sql'],
-                'vue': ['main.js', 'app.js'],
-                'svelte': ['main.js', 'app.js'],
-                'clojure': ['main.clj', 'app.clj'],
-                'fsharp': ['Program.fs', 'App.fs'],
-                'perl': ['main.pl', 'app.pl'],
-                'lua': ['main.lua', 'app.lua']
-            }
-            
             # Get filename
             filename = os.path.basename(file_path)
             
             # Check if file is an entry point for its type
-            return filename in entry_point_patterns.get(file_type, [])
+            return _is_entry_point_name(filename, file_type)
             
         except Exception as e:
             self.logger.error(f"Error checking if file is entry point: {str(e)}")
@@ -1142,43 +1226,11 @@ Detailed summary:"""
         """Check if a file is a core file."""
         try:
             # Get file name and directory
-            file_name = os.path.basename(file_path)
-            dir_name = os.path.dirname(file_path)
-            
-            # Define core patterns
-            core_patterns = {
-                'python': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'javascript': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'typescript': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'java': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'cpp': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'csharp': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'go': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'ruby': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'php': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'swift': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'kotlin': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'scala': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'rust': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'r': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'matlab': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'shell': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'sql': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'vue': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'svelte': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'clojure': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'fsharp': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'perl': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings'],
-                'lua': ['core', 'base', 'common', 'utils', 'helpers', 'config', 'settings']
-            }
+            file_name = os.path.basename(file_path).lower()
+            dir_name = os.path.dirname(file_path).lower()
             
             # Check if file is in core directory
-            for lang, patterns in core_patterns.items():
-                for pattern in patterns:
-                    if pattern in dir_name.lower() or pattern in file_name.lower():
-                        return True
-            
-            return False
+            return _has_core_pattern(dir_name) or _has_core_pattern(file_name)
             
         except Exception as e:
             self.logger.error(f"Error checking if file is core file: {str(e)}")
@@ -1216,15 +1268,22 @@ Detailed summary:"""
                 repo_url=repo_url
             )
             
-            # Clone the repository
+            # Clone the repository, or refresh an existing clone in place
             try:
-                if os.path.exists(repo_path):
-                    shutil.rmtree(repo_path)
-                os.makedirs(repo_path, exist_ok=True)
-                
-                # Clone the repository
-                subprocess.run(['git', 'clone', repo_url, repo_path], check=True, capture_output=True)
-                self.logger.info(f"Successfully cloned repository to {repo_path}")
+                if os.path.isdir(os.path.join(repo_path, '.git')):
+                    # Shallow fetch only the latest commit instead of re-cloning from scratch
+                    subprocess.run(['git', '-C', repo_path, 'remote', 'set-url', 'origin', repo_url], check=True, capture_output=True)
+                    subprocess.run(['git', '-C', repo_path, 'fetch', '--depth', '1', 'origin', 'HEAD'], check=True, capture_output=True)
+                    subprocess.run(['git', '-C', repo_path, 'reset', '--hard', 'FETCH_HEAD'], check=True, capture_output=True)
+                    subprocess.run(['git', '-C', repo_path, 'clean', '-fdx'], check=True, capture_output=True)
+                    self.logger.info(f"Successfully updated existing clone at {repo_path}")
+                else:
+                    if os.path.exists(repo_path):
+                        shutil.rmtree(repo_path)
+                    
+                    # Shallow clone, history is not needed for indexing
+                    subprocess.run(['git', 'clone', '--depth', '1', repo_url, repo_path], check=True, capture_output=True)
+                    self.logger.info(f"Successfully cloned repository to {repo_path}")
             except subprocess.CalledProcessError as e:
                 self.logger.error(f"Failed to clone repository: {e.stderr.decode()}")
                 self.db.update_indexing_status(
@@ -1369,28 +1428,24 @@ Detailed summary:"""
             if os.path.getsize(file_path) > 10 * 1024 * 1024:  # 10MB
                 return True
             
-            # Check file content
+            # Check file content for non-text characters (NUL included) in a single pass
             with open(file_path, 'rb') as f:
                 chunk = f.read(1024)
-                if b'\0' in chunk:
-                    return True
-                
-                # Check for non-text characters
-                text_chars = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
-                return bool(chunk.translate(None, text_chars))
+                return bool(chunk.translate(None, TEXT_CHARS))
                 
         except Exception as e:
             self.logger.error(f"Error checking if file is binary: {str(e)}")
             return True
 
-    def _extract_imports(self, content: str, language: str) -> List[str]:
+    def _extract_imports(self, content: str, language: str, tree: Optional[Any] = None) -> List[str]:
         """Extract imports using tree-sitter or regex as fallback."""
         try:
-            # Try tree-sitter first
+            # Try tree-sitter first, reusing the caller's parse tree when given
             if language in self.languages:
-                tree = self._parse_with_tree_sitter(content, language)
+                if tree is None:
+                    tree = self._parse_with_tree_sitter(content, language)
                 if tree:
-                    imports = self._extract_imports_with_tree_sitter(tree, language)
+                    imports = self._extract_imports_with_tree_sitter(tree, content.encode('utf8'), language)
                     if imports:
                         return imports
             
@@ -1401,14 +1456,14 @@ Detailed summary:"""
             self.logger.error(f"Error extracting imports: {str(e)}")
             return []
 
-    def _calculate_file_hash(self, content: str) -> str:
-        """Calculate a hash of the file content."""
+    def _calculate_file_hash(self, content: bytes) -> str:
+        """Calculate a hash of the raw file content."""
         try:
-            # Create a hash object
-            hash_obj = hashlib.sha256()
+            # Create a hash object (BLAKE2b is considerably faster than SHA-256 in software)
+            hash_obj = hashlib.blake2b(digest_size=32)
             
             # Update hash with content
-            hash_obj.update(content.encode('utf-8'))
+            hash_obj.update(content)
             
             # Return hexadecimal representation of hash
             return hash_obj.hexdigest()
@@ -1417,31 +1472,51 @@ Detailed summary:"""
             self.logger.error(f"Error calculating file hash: {str(e)}")
             return "hash_calculation_failed"
 
-    def _extract_methods(self, content: str, language: str) -> List[Dict[str, Any]]:
+    def _extract_methods(self, content: str, language: str, tree: Optional[Any] = None) -> List[Dict[str, Any]]:
         """Extract methods using tree-sitter or regex as fallback."""
         try:
-            # Try tree-sitter first
+            methods = []
+            
+            # Try tree-sitter first, reusing the caller's parse tree when given
             if language in self.languages:
-                tree = self._parse_with_tree_sitter(content, language)
+                if tree is None:
+                    tree = self._parse_with_tree_sitter(content, language)
                 if tree:
-                    methods = self._extract_methods_with_tree_sitter(tree, language)
-                    if methods:
-                        return methods
+                    methods = self._extract_methods_with_tree_sitter(tree, content.encode('utf8'), language)
             
             # Fall back to regex
-            return self._extract_methods_with_regex(content, language)
+            if not methods:
+                methods = self._extract_methods_with_regex(content, language)
+            
+            return self._summarize_methods(methods, language)
             
         except Exception as e:
             self.logger.error(f"Error extracting methods: {str(e)}")
             return []
 
+    def _summarize_methods(self, methods: List[Dict[str, Any]], language: str) -> List[Dict[str, Any]]:
+        """Generate method summaries using LLM, overlapping the requests for a file."""
+        if not methods:
+            return methods
+        
+        prompts = [f"Please provide a concise summary of this {language} method:\n\n{method['body']}" for method in methods]
+        
+        # Bound the number of in-flight requests to the Ollama server
+        summaries = self.llm_client.generate_many(prompts, max_concurrency=self.max_workers)
+        
+        for method, summary in zip(methods, summaries):
+            method['summary'] = summary
+        
+        return methods
+
     def _initialize_search_engine(self) -> None:
         """Initialize the search engine with indexed files."""
         try:
             # Get all indexed files from the database
             indexed_files = self.db.get_indexed_files()
             
-            # Process each file and add to search engine
+            # Collect each file and its methods, then add them to the search engine in one batch
+            documents = []
             for file_info in indexed_files:
                 try:
                     # Get file content
@@ -1449,36 +1524,38 @@ Detailed summary:"""
                     if not content:
                         continue
                     
-                    # Add to search engine
-                    self.search_engine.add_document(
-                        file_path=file_info['file_path'],
-                        content=content,
-                        metadata={
+                    file_documents = [{
+                        'file_path': file_info['file_path'],
+                        'content': content,
+                        'metadata': {
                             'language': file_info['language'],
                             'summary': file_info['summary'],
                             'detailed_summary': file_info['detailed_summary'],
                             'is_entry_point': file_info['is_entry_point'],
                             'is_core_file': file_info['is_core_file']
                         }
-                    )
+                    }]
                     
-                    # Add methods to search engine
+                    # Methods
                     methods = self.db.get_file_methods(file_info['file_path'])
                     for method in methods:
-                        self.search_engine.add_document(
-                            file_path=file_info['file_path'],
-                            content=method['body'],
-                            metadata={
+                        file_documents.append({
+                            'file_path': file_info['file_path'],
+                            'content': method['body'],
+                            'metadata': {
                                 'type': 'method',
                                 'name': method['name'],
                                 'line_numbers': method['line_numbers'],
                                 'summary': method['summary']
                             }
-                        )
+                        })
+                    documents.extend(file_documents)
                     
                 except Exception as e:
                     self.logger.error(f"Error adding file {file_info['file_path']} to search engine: {str(e)}")
             
+            self.search_engine.add_documents_bulk(documents)
+            self.search_engine.flush()
             self.logger.info("Search engine initialized with indexed files")
             
         except Exception as e:
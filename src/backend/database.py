@@ -1,83 +1,285 @@
 import sqlite3
-import json
+import orjson
 import os
+import hashlib
+import zlib
 import logging
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Iterable, Tuple
 import threading
+import time
+import queue
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string with orjson."""
+    return orjson.dumps(obj).decode()
+
+_loads = orjson.loads
+
+# Text values at least this many characters long are stored zlib-compressed
+COMPRESS_MIN_CHARS = 512
+
+def _pack_text(value: Optional[str]) -> Union[str, bytes, None]:
+    """Compress long text into a BLOB for storage; short values stay plain TEXT."""
+    if value and len(value) >= COMPRESS_MIN_CHARS:
+        return zlib.compress(value.encode('utf-8'), 6)
+    return value
+
+def _unpack_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """Inverse of _pack_text; rows written before compression come back unchanged."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+@lru_cache(maxsize=4096)
+def _path_hash(path: str) -> int:
+    """Stable 63-bit hash of a file path, stored alongside it as a compact index key."""
+    digest = hashlib.blake2b(path.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & ((1 << 63) - 1)
+
+# Writer thread batching: rows per transaction and seconds to wait for a batch to fill
+WRITE_BATCH_SIZE = 500
+WRITE_BATCH_WINDOW = 0.05
+
+# Per-connection settings: WAL-friendly syncing, a 64 MiB page cache and 256 MiB of mmap
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA trusted_schema=OFF",
+)
+
+# Index backing get_indexing_status(repo_url); recreated whenever the status table is rebuilt
+STATUS_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_status_repo_updated ON indexing_status(repo_url, last_updated DESC)"
+
+# Hot-path statements, kept as constants so every call hits the connection's statement cache
+_INSERT_FILE_SQL = '''
+INSERT OR REPLACE INTO files (file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file, file_path_hash, last_indexed)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+_INSERT_METHOD_SQL = '''
+INSERT INTO methods (file_path, method_name, method_type, line_numbers, summary, file_path_hash)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+# Saving a file replaces its methods: its old rows go, and the methods queued after it are inserted fresh
+_DELETE_FILE_METHODS_SQL = "DELETE FROM methods WHERE file_path_hash = ? AND file_path = ?"
+_INSERT_RELATIONSHIP_SQL = '''
+INSERT INTO relationships (source_file, target_file, relationship_type, source_file_hash, target_file_hash)
+VALUES (?, ?, ?, ?, ?)
+'''
+# Lookups match the integer hash first and keep the path comparison as a collision tiebreaker
+# (unary + keeps the planner on the compact hash index rather than the file_path UNIQUE index)
+_SELECT_FILE_SQL = '''
+SELECT file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file, last_indexed
+FROM files
+WHERE file_path_hash = ? AND +file_path = ?
+'''
+_SELECT_METHODS_SQL = '''
+SELECT method_name, method_type, line_numbers, summary
+FROM methods
+WHERE file_path_hash = ? AND file_path = ?
+'''
+_SELECT_RELATIONSHIPS_SQL = '''
+SELECT source_file, target_file, relationship_type
+FROM relationships
+WHERE (source_file_hash = ? AND source_file = ?) OR (target_file_hash = ? AND target_file = ?)
+'''
+_SELECT_FILE_HASH_SQL = "SELECT file_hash FROM files WHERE file_path_hash = ? AND +file_path = ?"
+# Summaries of the files under a path prefix, in path order
+_SELECT_SUMMARIES_SQL = '''
+SELECT file_path, summary FROM files WHERE summary IS NOT NULL AND substr(file_path, 1, ?) = ? ORDER BY file_path
+'''
+_UPDATE_PROGRESS_SQL = '''
+UPDATE indexing_status
+SET processed_files = ?, failed_files = ?, success_rate = ?, last_updated = ?
+WHERE id = 1
+'''
+
+# Bumped whenever _migrate_schema gains a step; stored in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+# Path hash columns per table, backfilled on older databases
+PATH_HASH_COLUMNS = {
+    'files': (('file_path_hash', 'file_path'),),
+    'methods': (('file_path_hash', 'file_path'),),
+    'relationships': (('source_file_hash', 'source_file'), ('target_file_hash', 'target_file')),
+}
+
+# Size of each connection's prepared statement cache
+CACHED_STATEMENTS = 256
+
+# Minimum seconds between in-progress indexing status writes
+STATUS_FLUSH_INTERVAL = 1.0
+
+# Seconds between checkpoints of the indexed/failed file lists during a run
+STATUS_CHECKPOINT_INTERVAL = 30.0
+
+# Queued by close() to stop the writer thread
+_STOP_WRITER = object()
+
+# Database files already switched to WAL by this process
+_WAL_DATABASES = set()
+_WAL_LOCK = threading.Lock()
+
 class Database:
     """Database class for storing codebase information."""
     
-    def __init__(self, db_path: str = "codebase.db"):
+    def __init__(self, db_path: str = "codebase.db", read_pool_size: int = 4):
         """Initialize the database."""
         self.db_path = db_path
-        self._local = threading.local()
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        self._read_pool = queue.Queue()
+        self._read_pool_size = read_pool_size
+        self._read_conns = []
+        self._pool_lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
+        self._bulk_writers = {
+            'files': self.save_files_bulk,
+            'methods': self.save_methods_bulk,
+            'relationships': self.save_relationships_bulk,
+        }
+        self._last_status_flush = 0.0
+        self._last_status_flags = None
+        self._last_status_checkpoint = 0.0
+        self._last_status_maps = None
+        self._indexed_files = None
         self._init_db()
+        
+        # save_* calls are queued and written by a single background thread
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="database-writer", daemon=True)
+        self._writer.start()
+    
+    @contextmanager
+    def _write(self):
+        """Hold the single read-write connection for the duration of a write."""
+        with self._write_lock:
+            if self._write_conn is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+                self._configure_connection(conn, read_only=False)
+                conn.create_function("path_hash", 1, _path_hash, deterministic=True)
+                self._write_conn = conn
+            yield self._write_conn
+    
+    @contextmanager
+    def _borrow_read(self):
+        """Borrow a read-only connection from the pool, opening one if the pool isn't full yet."""
+        # Let queued saves land first so reads see this instance's own writes
+        if self._write_queue.unfinished_tasks:
+            self.flush()
+        
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = len(self._read_conns) < self._read_pool_size
+                if create:
+                    conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False,
+                                           cached_statements=CACHED_STATEMENTS)
+                    self._configure_connection(conn, read_only=True)
+                    conn.row_factory = sqlite3.Row
+                    self._read_conns.append(conn)
+            if not create:
+                conn = self._read_pool.get()
+        
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+    
+    def _configure_connection(self, conn: sqlite3.Connection, read_only: bool) -> None:
+        """Apply PRAGMAs tuned for the write-heavy indexing workload."""
+        # journal_mode is persistent in the database file, so only switch it once per path
+        if not read_only:
+            with _WAL_LOCK:
+                if self.db_path not in _WAL_DATABASES:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    _WAL_DATABASES.add(self.db_path)
+        
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
     
-    def _get_connection(self):
-        """Get a thread-local database connection."""
-        if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-        return self._local.connection
+    def close(self) -> None:
+        """Stop the writer thread, then optimize and close the write connection and all pooled read connections."""
+        self.flush()
+        if self._writer.is_alive():
+            self._write_queue.put(_STOP_WRITER)
+            self._writer.join()
+        
+        with self._write_lock:
+            if self._write_conn is not None:
+                try:
+                    self._write_conn.execute("PRAGMA optimize")
+                finally:
+                    self._write_conn.close()
+                    self._write_conn = None
+        
+        with self._pool_lock:
+            for conn in self._read_conns:
+                conn.close()
+            self._read_conns = []
+            self._read_pool = queue.Queue()
     
     def _init_db(self):
         """Initialize the database tables."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Create files table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_path TEXT UNIQUE,
-                language TEXT,
-                file_hash TEXT,
-                summary TEXT,
-                detailed_summary TEXT,
-                is_entry_point BOOLEAN,
-                is_core_file BOOLEAN,
-                last_indexed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            
-            # Create methods table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS methods (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_path TEXT,
-                method_name TEXT,
-                method_type TEXT,
-                line_numbers TEXT,
-                summary TEXT,
-                FOREIGN KEY (file_path) REFERENCES files (file_path)
-            )
-            ''')
-            
-            # Create relationships table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS relationships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                source_file TEXT,
-                target_file TEXT,
-                relationship_type TEXT,
-                FOREIGN KEY (source_file) REFERENCES files (file_path),
-                FOREIGN KEY (target_file) REFERENCES files (file_path)
-            )
-            ''')
-            
-            # Check if indexing_status table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='indexing_status'")
-            table_exists = cursor.fetchone() is not None
-            
-            if not table_exists:
+            with self._write() as conn:
+                cursor = conn.cursor()
+                
+                # Create files table
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_path TEXT UNIQUE,
+                    language TEXT,
+                    file_hash TEXT,
+                    summary TEXT,
+                    detailed_summary TEXT,
+                    is_entry_point BOOLEAN,
+                    is_core_file BOOLEAN,
+                    file_path_hash INTEGER,
+                    last_indexed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+                
+                # Create methods table
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS methods (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_path TEXT,
+                    method_name TEXT,
+                    method_type TEXT,
+                    line_numbers TEXT,
+                    summary TEXT,
+                    file_path_hash INTEGER,
+                    FOREIGN KEY (file_path) REFERENCES files (file_path)
+                )
+                ''')
+                
+                # Create relationships table
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS relationships (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_file TEXT,
+                    target_file TEXT,
+                    relationship_type TEXT,
+                    source_file_hash INTEGER,
+                    target_file_hash INTEGER,
+                    FOREIGN KEY (source_file) REFERENCES files (file_path),
+                    FOREIGN KEY (target_file) REFERENCES files (file_path)
+                )
+                ''')
+                
                 # Create indexing_status table with all columns
                 cursor.execute('''
-                CREATE TABLE indexing_status (
+                CREATE TABLE IF NOT EXISTS indexing_status (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     total_files INTEGER,
                     processed_files INTEGER,
@@ -93,66 +295,169 @@ class Database:
                     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
                 ''')
-            else:
-                # Check existing columns
-                cursor.execute("PRAGMA table_info(indexing_status)")
-                columns = [column[1] for column in cursor.fetchall()]
                 
-                # Add missing columns if they don't exist
-                if 'indexed_files' not in columns:
-                    self.logger.info("Adding indexed_files column to indexing_status table")
-                    cursor.execute("ALTER TABLE indexing_status ADD COLUMN indexed_files TEXT")
+                # Append-only list of indexed files backing indexing_status, so progress updates don't rewrite it
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indexed_files (
+                    id INTEGER PRIMARY KEY,
+                    repo_url TEXT,
+                    file_path TEXT
+                )
+                ''')
+                
+                # Run migrations only when the file predates the current schema version
+                cursor.execute("PRAGMA user_version")
+                if cursor.fetchone()[0] < SCHEMA_VERSION:
+                    self._migrate_schema(cursor)
+                    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
                 
-                if 'failed_files_details' not in columns:
-                    self.logger.info("Adding failed_files_details column to indexing_status table")
-                    cursor.execute("ALTER TABLE indexing_status ADD COLUMN failed_files_details TEXT")
+                conn.commit()
+                self.logger.info("Database tables initialized successfully")
                 
-                if 'last_updated' not in columns:
-                    self.logger.info("Adding last_updated column to indexing_status table")
-                    cursor.execute("ALTER TABLE indexing_status ADD COLUMN last_updated TIMESTAMP")
-            
-            conn.commit()
-            self.logger.info("Database tables initialized successfully")
-            
         except Exception as e:
             self.logger.error(f"Error initializing database: {str(e)}")
             raise
     
-    def save_file(self, file_path: str, language: str, file_hash: str, summary: str, detailed_summary: str, is_entry_point: bool, is_core_file: bool):
-        """Save file metadata to the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _migrate_schema(self, cursor: sqlite3.Cursor) -> None:
+        """Bring a database written by an older version up to SCHEMA_VERSION."""
+        # Check existing indexing_status columns
+        cursor.execute("PRAGMA table_info(indexing_status)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        # Add missing columns if they don't exist
+        if 'indexed_files' not in columns:
+            self.logger.info("Adding indexed_files column to indexing_status table")
+            cursor.execute("ALTER TABLE indexing_status ADD COLUMN indexed_files TEXT")
+        
+        if 'failed_files_details' not in columns:
+            self.logger.info("Adding failed_files_details column to indexing_status table")
+            cursor.execute("ALTER TABLE indexing_status ADD COLUMN failed_files_details TEXT")
+        
+        if 'last_updated' not in columns:
+            self.logger.info("Adding last_updated column to indexing_status table")
+            cursor.execute("ALTER TABLE indexing_status ADD COLUMN last_updated TIMESTAMP")
+        
+        # Add and backfill path hash columns on databases created before they existed
+        for table, columns in PATH_HASH_COLUMNS.items():
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing = {column[1] for column in cursor.fetchall()}
+            for hash_column, path_column in columns:
+                if hash_column not in existing:
+                    self.logger.info(f"Adding {hash_column} column to {table} table")
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {hash_column} INTEGER")
+                    cursor.execute(f"UPDATE {table} SET {hash_column} = path_hash({path_column})")
+        
+        # Index the columns used in WHERE clauses so lookups don't scan whole tables
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_path_hash ON files(file_path_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_methods_path_hash ON methods(file_path_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rel_src_hash ON relationships(source_file_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rel_tgt_hash ON relationships(target_file_hash)")
         
-        cursor.execute('''
-        INSERT OR REPLACE INTO files (file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file, last_indexed)
-        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file))
+        # Same-named methods of one file (overloads, methods of different classes) are distinct rows, so
+        # methods are no longer unique per (file_path, method_name)
+        cursor.execute("DROP INDEX IF EXISTS idx_methods_file_name")
         
-        conn.commit()
+        # The text-keyed relationship indexes are superseded by the hash indexes
+        cursor.execute("DROP INDEX IF EXISTS idx_rel_src")
+        cursor.execute("DROP INDEX IF EXISTS idx_rel_tgt")
+        cursor.execute(STATUS_INDEX_SQL)
+    
+    def save_file(self, file_path: str, language: str, file_hash: str, summary: str, detailed_summary: str, is_entry_point: bool, is_core_file: bool):
+        """Save file metadata to the database."""
+        self._save_rows('files', (file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file))
     
     def save_method(self, file_path: str, method_name: str, method_type: str, line_numbers: Dict[str, int], summary: str):
         """Save method metadata to the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO methods (file_path, method_name, method_type, line_numbers, summary)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (file_path, method_name, method_type, json.dumps(line_numbers), summary))
-        
-        conn.commit()
+        self._save_rows('methods', (file_path, method_name, method_type, _dumps(line_numbers), summary))
     
     def save_relationship(self, source_file: str, target_file: str, relationship_type: str):
         """Save file relationship to the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        self._save_rows('relationships', (source_file, target_file, relationship_type))
+    
+    def save_files_bulk(self, rows: Iterable[Tuple]) -> None:
+        """Save many files in a single transaction.
+        
+        Each row is (file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file).
+        Long detailed summaries are stored compressed, and each file's previously saved methods are removed.
+        """
+        rows = list(rows)
+        with self._write() as conn, conn:
+            conn.executemany(_DELETE_FILE_METHODS_SQL, ((_path_hash(row[0]), row[0]) for row in rows))
+            conn.executemany(_INSERT_FILE_SQL, ((*row[:4], _pack_text(row[4]), *row[5:], _path_hash(row[0])) for row in rows))
+    
+    def save_methods_bulk(self, rows: Iterable[Tuple]) -> None:
+        """Save many methods in a single transaction.
         
-        cursor.execute('''
-        INSERT INTO relationships (source_file, target_file, relationship_type)
-        VALUES (?, ?, ?)
-        ''', (source_file, target_file, relationship_type))
+        Each row is (file_path, method_name, method_type, line_numbers_json, summary). Rows are appended, so
+        save a file before its methods to replace the ones saved with it last time.
+        """
+        with self._write() as conn, conn:
+            conn.executemany(_INSERT_METHOD_SQL, ((*row, _path_hash(row[0])) for row in rows))
+    
+    def save_relationships_bulk(self, rows: Iterable[Tuple]) -> None:
+        """Save many file relationships in a single transaction.
         
-        conn.commit()
+        Each row is (source_file, target_file, relationship_type).
+        """
+        with self._write() as conn, conn:
+            conn.executemany(_INSERT_RELATIONSHIP_SQL, ((*row, _path_hash(row[0]), _path_hash(row[1])) for row in rows))
+    
+    @contextmanager
+    def bulk(self):
+        """Group a run of save_* calls; everything queued is written by the time the block exits."""
+        try:
+            yield self
+        finally:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Block until every queued save has been written."""
+        self._write_queue.join()
+    
+    def _save_rows(self, table: str, row: Tuple) -> None:
+        """Queue a row for the writer thread."""
+        self._write_queue.put((table, row))
+    
+    def _writer_loop(self) -> None:
+        """Drain the write queue, writing up to WRITE_BATCH_SIZE rows per batch."""
+        stop = False
+        while not stop:
+            item = self._write_queue.get()
+            if item is _STOP_WRITER:
+                self._write_queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + WRITE_BATCH_WINDOW
+            while len(batch) < WRITE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                
+                # Write what was queued before close() and then exit
+                if item is _STOP_WRITER:
+                    self._write_queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            
+            try:
+                rows = {'files': [], 'methods': [], 'relationships': []}
+                for table, row in batch:
+                    rows[table].append(row)
+                
+                # Files first so methods and relationships never reference a missing row
+                for table in ('files', 'methods', 'relationships'):
+                    if rows[table]:
+                        self._bulk_writers[table](rows[table])
+            except Exception as e:
+                self.logger.error(f"Error writing queued rows: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
     
     def update_indexing_status(
         self,
@@ -168,116 +473,257 @@ class Database:
         is_loading: bool = False,
         repo_url: str = None
     ) -> None:
-        """Update the indexing status in the database."""
+        """Update the indexing status in the database.
+        
+        In-progress updates are coalesced to one write per STATUS_FLUSH_INTERVAL and only touch the
+        counters (just the progress counters when totals and type counts are unchanged); the file lists are kept in memory and checkpointed every STATUS_CHECKPOINT_INTERVAL,
+        on completion and on loading-state changes.
+        """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            # Report completion only once every queued row is on disk
+            if is_complete:
+                self.flush()
             
-            # Convert dictionaries to JSON strings
-            file_types_json = json.dumps(file_types)
-            languages_json = json.dumps(languages)
-            indexed_files_json = json.dumps(indexed_files or [])
-            failed_files_details_json = json.dumps(failed_files_details or [])
+            # Skip the write if nothing but progress changed since a very recent flush
+            flags = (is_complete, is_loading, repo_url)
+            now = time.monotonic()
+            if (not is_complete and flags == self._last_status_flags
+                    and now - self._last_status_flush < STATUS_FLUSH_INTERVAL):
+                return
             
-            # Update or insert indexing status
-            cursor.execute("""
-                INSERT OR REPLACE INTO indexing_status (
-                    id,
-                    total_files,
-                    processed_files,
-                    failed_files,
-                    success_rate,
-                    file_types,
-                    languages,
-                    indexed_files,
-                    failed_files_details,
-                    is_complete,
-                    is_loading,
-                    repo_url,
-                    last_updated
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                1,  # Use a single row for status
-                total_files,
-                processed_files,
-                failed_files,
-                success_rate,
-                file_types_json,
-                languages_json,
-                indexed_files_json,
-                failed_files_details_json,
-                is_complete,
-                is_loading,
-                repo_url,
-                datetime.now().isoformat()
-            ))
+            # Keep the caller's lists so this instance can serve them before the next checkpoint
+            self._indexed_files = (repo_url, indexed_files or [], failed_files_details or [])
+            checkpoint = (is_complete or flags != self._last_status_flags
+                          or now - self._last_status_checkpoint >= STATUS_CHECKPOINT_INTERVAL)
+            maps = (total_files, file_types, languages)
             
-            conn.commit()
-            self.logger.info(f"Updated indexing status: {processed_files}/{total_files} files processed")
+            if not checkpoint and maps == self._last_status_maps:
+                self.update_progress_counters(processed_files, failed_files, success_rate)
+                self._last_status_flush = now
+                return
             
+            with self._write() as conn:
+                cursor = conn.cursor()
+                
+                # Convert dictionaries to JSON strings
+                file_types_json = _dumps(file_types)
+                languages_json = _dumps(languages)
+                
+                if not checkpoint:
+                    # Progress only: leave the file lists as of the last checkpoint
+                    cursor.execute("""
+                        UPDATE indexing_status
+                        SET total_files = ?, processed_files = ?, failed_files = ?, success_rate = ?,
+                            file_types = ?, languages = ?, last_updated = ?
+                        WHERE id = 1
+                    """, (
+                        total_files,
+                        processed_files,
+                        failed_files,
+                        success_rate,
+                        file_types_json,
+                        languages_json,
+                        datetime.now().isoformat()
+                    ))
+                else:
+                    # Append only the newly indexed files
+                    self._sync_indexed_files(cursor, indexed_files or [], repo_url)
+                    
+                    # Update or insert indexing status, keeping the stored failure list for appending
+                    cursor.execute("""
+                        INSERT INTO indexing_status (
+                            id,
+                            total_files,
+                            processed_files,
+                            failed_files,
+                            success_rate,
+                            file_types,
+                            languages,
+                            indexed_files,
+                            is_complete,
+                            is_loading,
+                            repo_url,
+                            last_updated
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            total_files = excluded.total_files,
+                            processed_files = excluded.processed_files,
+                            failed_files = excluded.failed_files,
+                            success_rate = excluded.success_rate,
+                            file_types = excluded.file_types,
+                            languages = excluded.languages,
+                            indexed_files = excluded.indexed_files,
+                            is_complete = excluded.is_complete,
+                            is_loading = excluded.is_loading,
+                            repo_url = excluded.repo_url,
+                            last_updated = excluded.last_updated
+                    """, (
+                        1,  # Use a single row for status
+                        total_files,
+                        processed_files,
+                        failed_files,
+                        success_rate,
+                        file_types_json,
+                        languages_json,
+                        None,  # Stored in the indexed_files table
+                        is_complete,
+                        is_loading,
+                        repo_url,
+                        datetime.now().isoformat()
+                    ))
+                    self._sync_failed_files(cursor, failed_files_details or [])
+                    self._last_status_checkpoint = now
+                
+                conn.commit()
+                self._last_status_flush = now
+                self._last_status_flags = flags
+                self._last_status_maps = (total_files, dict(file_types), dict(languages))
+                self.logger.info(f"Updated indexing status: {processed_files}/{total_files} files processed")
+                
         except Exception as e:
             self.logger.error(f"Error updating indexing status: {str(e)}")
             raise
     
-    def get_indexing_status(self, repo_url: Optional[str] = None) -> Dict[str, Any]:
-        """Get the latest indexing status from the database."""
+    def update_progress_counters(self, processed_files: int, failed_files: int, success_rate: float) -> None:
+        """Update only the progress counters of the status row."""
+        with self._write() as conn, conn:
+            conn.execute(_UPDATE_PROGRESS_SQL, (processed_files, failed_files, success_rate, datetime.now().isoformat()))
+    
+    def _sync_indexed_files(self, cursor: sqlite3.Cursor, indexed_files: List[str], repo_url: Optional[str]) -> None:
+        """Bring the indexed_files table in line with the given list, appending when it only grew."""
+        # Rows are numbered 1..n in list order, so the last row tells us how much is already stored
+        cursor.execute("SELECT id, repo_url, file_path FROM indexed_files ORDER BY id DESC LIMIT 1")
+        last = cursor.fetchone()
+        stored = last[0] if last else 0
+        
+        if stored and (last[1] != repo_url or len(indexed_files) < stored or indexed_files[stored - 1] != last[2]):
+            # Not a continuation of the stored list (new run or different repo), start over
+            cursor.execute("DELETE FROM indexed_files")
+            stored = 0
+        
+        cursor.executemany(
+            "INSERT INTO indexed_files (id, repo_url, file_path) VALUES (?, ?, ?)",
+            ((i, repo_url, path) for i, path in enumerate(indexed_files[stored:], start=stored + 1))
+        )
+    
+    def _sync_failed_files(self, cursor: sqlite3.Cursor, failed_files_details: List[Dict[str, str]]) -> None:
+        """Append new failure entries to the status row with json_insert, rewriting only if the list was replaced."""
+        cursor.execute("""
+            SELECT json_array_length(failed_files_details), json_extract(failed_files_details, '$[#-1]')
+            FROM indexing_status
+            WHERE id = 1
+        """)
+        row = cursor.fetchone()
+        stored = row[0] if row and row[0] else 0
+        
+        if stored and (len(failed_files_details) < stored or _loads(row[1]) != failed_files_details[stored - 1]):
+            cursor.execute("UPDATE indexing_status SET failed_files_details = ? WHERE id = 1", (_dumps(failed_files_details),))
+            return
+        
+        cursor.executemany(
+            "UPDATE indexing_status SET failed_files_details = json_insert(COALESCE(failed_files_details, '[]'), '$[#]', json(?)) WHERE id = 1",
+            ((_dumps(detail),) for detail in failed_files_details[stored:])
+        )
+    
+    def get_progress(self, repo_url: Optional[str] = None) -> Dict[str, Any]:
+        """Get the indexing counters and file-type breakdown without loading the file lists."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            if repo_url:
-                cursor.execute('''
-                SELECT total_files, processed_files, failed_files, success_rate, 
-                       file_types, languages, indexed_files, failed_files_details,
-                       is_complete, is_loading, repo_url, last_updated
-                FROM indexing_status
-                WHERE repo_url = ?
-                ORDER BY last_updated DESC
-                LIMIT 1
-                ''', (repo_url,))
-            else:
+            with self._borrow_read() as conn:
+                cursor = conn.cursor()
+                
                 cursor.execute('''
-                SELECT total_files, processed_files, failed_files, success_rate,
-                       file_types, languages, indexed_files, failed_files_details,
+                SELECT total_files, processed_files, failed_files, success_rate, file_types,
                        is_complete, is_loading, repo_url, last_updated
                 FROM indexing_status
+                WHERE ? IS NULL OR repo_url = ?
                 ORDER BY last_updated DESC
                 LIMIT 1
-                ''')
-            
-            row = cursor.fetchone()
-            if row:
+                ''', (repo_url, repo_url))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return {}
+                
+                progress = dict(row)
+                progress.update(
+                    file_types=_loads(row['file_types']) if row['file_types'] else {},
+                    is_complete=bool(row['is_complete']),
+                    is_loading=bool(row['is_loading'])
+                )
+                return progress
+                
+        except Exception as e:
+            self.logger.error(f"Error getting indexing progress: {str(e)}")
+            return {}
+    
+    def get_indexing_status(self, repo_url: Optional[str] = None) -> Dict[str, Any]:
+        """Get the latest indexing status from the database."""
+        try:
+            with self._borrow_read() as conn:
+                cursor = conn.cursor()
+                
+                if repo_url:
+                    cursor.execute('''
+                    SELECT total_files, processed_files, failed_files, success_rate, 
+                           file_types, languages, indexed_files, failed_files_details,
+                           is_complete, is_loading, repo_url, last_updated
+                    FROM indexing_status
+                    WHERE repo_url = ?
+                    ORDER BY last_updated DESC
+                    LIMIT 1
+                    ''', (repo_url,))
+                else:
+                    cursor.execute('''
+                    SELECT total_files, processed_files, failed_files, success_rate,
+                           file_types, languages, indexed_files, failed_files_details,
+                           is_complete, is_loading, repo_url, last_updated
+                    FROM indexing_status
+                    ORDER BY last_updated DESC
+                    LIMIT 1
+                    ''')
+                
+                row = cursor.fetchone()
+                if row:
+                    pending = self._indexed_files
+                    if pending is not None and pending[0] == row['repo_url']:
+                        # This instance is indexing the repo; its lists are newer than the last checkpoint
+                        indexed_files = list(pending[1])
+                        failed_files_details = list(pending[2])
+                    else:
+                        cursor.execute("SELECT file_path FROM indexed_files ORDER BY id")
+                        indexed_files = [path for (path,) in cursor.fetchall()]
+                        if not indexed_files and row['indexed_files']:
+                            # Status written before the indexed_files table existed
+                            indexed_files = _loads(row['indexed_files'])
+                        failed_files_details = _loads(row['failed_files_details']) if row['failed_files_details'] else []
+                    
+                    status = dict(row)
+                    status.update(
+                        file_types=_loads(row['file_types']) if row['file_types'] else {},
+                        languages=_loads(row['languages']) if row['languages'] else {},
+                        indexed_files=indexed_files,
+                        failed_files_details=failed_files_details,
+                        is_complete=bool(row['is_complete']),
+                        is_loading=bool(row['is_loading'])
+                    )
+                    return status
+                
+                # Return default values if no status found
                 return {
-                    'total_files': row[0],
-                    'processed_files': row[1],
-                    'failed_files': row[2],
-                    'success_rate': row[3],
-                    'file_types': json.loads(row[4]) if row[4] else {},
-                    'languages': json.loads(row[5]) if row[5] else {},
-                    'indexed_files': json.loads(row[6]) if row[6] else [],
-                    'failed_files_details': json.loads(row[7]) if row[7] else [],
-                    'is_complete': bool(row[8]),
-                    'is_loading': bool(row[9]),
-                    'repo_url': row[10],
-                    'last_updated': row[11]
+                    'total_files': 0,
+                    'processed_files': 0,
+                    'failed_files': 0,
+                    'success_rate': 0.0,
+                    'file_types': {},
+                    'languages': {},
+                    'indexed_files': [],
+                    'failed_files_details': [],
+                    'is_complete': False,
+                    'is_loading': False,
+                    'repo_url': None,
+                    'last_updated': None
                 }
-            
-            # Return default values if no status found
-            return {
-                'total_files': 0,
-                'processed_files': 0,
-                'failed_files': 0,
-                'success_rate': 0.0,
-                'file_types': {},
-                'languages': {},
-                'indexed_files': [],
-                'failed_files_details': [],
-                'is_complete': False,
-                'is_loading': False,
-                'repo_url': None,
-                'last_updated': None
-            }
-            
+                
         except Exception as e:
             self.logger.error(f"Error getting indexing status: {str(e)}")
             # Return default values on error
@@ -298,131 +744,103 @@ class Database:
     
     def get_file_metadata(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Get file metadata from the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT file_path, language, file_hash, summary, detailed_summary, is_entry_point, is_core_file, last_indexed
-        FROM files
-        WHERE file_path = ?
-        ''', (file_path,))
-        
-        row = cursor.fetchone()
-        if row:
-            return {
-                'file_path': row[0],
-                'language': row[1],
-                'file_hash': row[2],
-                'summary': row[3],
-                'detailed_summary': row[4],
-                'is_entry_point': row[5],
-                'is_core_file': row[6],
-                'last_indexed': row[7]
-            }
-        return None
+        with self._borrow_read() as conn:
+            row = conn.execute(_SELECT_FILE_SQL, (_path_hash(file_path), file_path)).fetchone()
+            if row:
+                metadata = dict(row)
+                metadata['detailed_summary'] = _unpack_text(row['detailed_summary'])
+                return metadata
+            return None
     
     def get_file_methods(self, file_path: str) -> List[Dict[str, Any]]:
         """Get methods for a file from the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT method_name, method_type, line_numbers, summary
-        FROM methods
-        WHERE file_path = ?
-        ''', (file_path,))
-        
-        methods = []
-        for row in cursor.fetchall():
-            methods.append({
-                'name': row[0],
-                'type': row[1],
-                'line_numbers': json.loads(row[2]),
-                'summary': row[3]
-            })
-        return methods
+        with self._borrow_read() as conn:
+            return [
+                {
+                    'name': row['method_name'],
+                    'type': row['method_type'],
+                    'line_numbers': _loads(row['line_numbers']),
+                    'summary': row['summary']
+                }
+                for row in conn.execute(_SELECT_METHODS_SQL, (_path_hash(file_path), file_path))
+            ]
     
     def get_file_relationships(self, file_path: str) -> List[Dict[str, str]]:
         """Get relationships for a file from the database."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT source_file, target_file, relationship_type
-        FROM relationships
-        WHERE source_file = ? OR target_file = ?
-        ''', (file_path, file_path))
-        
-        relationships = []
-        for row in cursor.fetchall():
-            relationships.append({
-                'source_file': row[0],
-                'target_file': row[1],
-                'relationship_type': row[2]
-            })
-        return relationships
+        path_hash = _path_hash(file_path)
+        with self._borrow_read() as conn:
+            return [dict(row) for row in conn.execute(_SELECT_RELATIONSHIPS_SQL, (path_hash, file_path, path_hash, file_path))]
     
     def needs_reindexing(self, file_path: str, file_hash: str) -> bool:
         """Check if a file needs reindexing based on its hash."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT file_hash
-        FROM files
-        WHERE file_path = ?
-        ''', (file_path,))
-        
-        row = cursor.fetchone()
-        if not row:
-            return True
-        
-        return row[0] != file_hash
+        with self._borrow_read() as conn:
+            row = conn.execute(_SELECT_FILE_HASH_SQL, (_path_hash(file_path), file_path)).fetchone()
+            if not row:
+                return True
+            
+            return row[0] != file_hash
+    
+    def get_file_summaries(self, root: str) -> Dict[str, str]:
+        """Get the stored summary of every file under root, keyed by path in path order."""
+        prefix = os.path.join(root, '')
+        with self._borrow_read() as conn:
+            return dict(conn.execute(_SELECT_SUMMARIES_SQL, (len(prefix), prefix)))
+    
+    def current_hashes(self) -> Dict[str, str]:
+        """Get the stored hash of every indexed file, keyed by path."""
+        with self._borrow_read() as conn:
+            return dict(conn.execute("SELECT file_path, file_hash FROM files"))
     
     def reset_indexing_status(self) -> None:
         """Reset the indexing status table."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Drop and recreate the indexing_status table
-            cursor.execute("DROP TABLE IF EXISTS indexing_status")
-            
-            # Recreate the table with the latest schema
-            cursor.execute('''
-            CREATE TABLE indexing_status (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                total_files INTEGER,
-                processed_files INTEGER,
-                failed_files INTEGER,
-                success_rate REAL,
-                file_types TEXT,
-                languages TEXT,
-                indexed_files TEXT,
-                failed_files_details TEXT,
-                is_complete BOOLEAN,
-                is_loading BOOLEAN,
-                repo_url TEXT,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            
-            # Insert initial row with current timestamp
-            cursor.execute('''
-            INSERT INTO indexing_status (
-                total_files, processed_files, failed_files, success_rate,
-                file_types, languages, indexed_files, failed_files_details,
-                is_complete, is_loading, repo_url, last_updated
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                0, 0, 0, 0.0,
-                '{}', '{}', '[]', '[]',
-                False, False, None, datetime.now().isoformat()
-            ))
-            
-            conn.commit()
-            self.logger.info("Indexing status table reset successfully")
-            
+            with self._write() as conn:
+                cursor = conn.cursor()
+                
+                # Drop and recreate the indexing_status table
+                cursor.execute("DROP TABLE IF EXISTS indexing_status")
+                cursor.execute("DELETE FROM indexed_files")
+                self._last_status_flags = None
+                self._last_status_maps = None
+                self._indexed_files = None
+                
+                # Recreate the table with the latest schema
+                cursor.execute('''
+                CREATE TABLE indexing_status (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    total_files INTEGER,
+                    processed_files INTEGER,
+                    failed_files INTEGER,
+                    success_rate REAL,
+                    file_types TEXT,
+                    languages TEXT,
+                    indexed_files TEXT,
+                    failed_files_details TEXT,
+                    is_complete BOOLEAN,
+                    is_loading BOOLEAN,
+                    repo_url TEXT,
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+                
+                cursor.execute(STATUS_INDEX_SQL)
+                
+                # Insert initial row with current timestamp
+                cursor.execute('''
+                INSERT INTO indexing_status (
+                    total_files, processed_files, failed_files, success_rate,
+                    file_types, languages, indexed_files, failed_files_details,
+                    is_complete, is_loading, repo_url, last_updated
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    0, 0, 0, 0.0,
+                    '{}', '{}', '[]', '[]',
+                    False, False, None, datetime.now().isoformat()
+                ))
+                
+                conn.commit()
+                self.logger.info("Indexing status table reset successfully")
+                
         except Exception as e:
             self.logger.error(f"Error resetting indexing status: {str(e)}")
             raise 
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import json
+import sqlite3
+import time
+import logging
+import threading
+import numpy as np
+import faiss
+from typing import Any, Optional
+from .vector_db import load_embedding_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response stays valid unless set() is given another ttl
+DEFAULT_TTL = 3600.0
+
+# Minimum cosine similarity for a stored prompt to count as a paraphrase of a new one
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+# Nearest stored prompts checked per lookup for one with the same model and scope
+SEMANTIC_LOOKUP_K = 8
+
+# Entries kept in the semantic cache; past this the oldest are evicted down to three quarters of it
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+
+class LLMCache:
+    def __init__(self, db_path: str = "llm_cache.db"):
+        """Persistent key/value store for LLM responses backed by SQLite."""
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        # One connection shared by the client's worker threads, serialized by the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] < time.time():
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                return row[0]
+        except Exception as e:
+            self.logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+
+    def set(self, key: str, value: str, ttl: float = DEFAULT_TTL) -> None:
+        """Store value under key for ttl seconds."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, time.time() + ttl)
+                )
+                self._conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error writing LLM cache: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+class SemanticCache:
+    def __init__(self, db_path: str = "semantic_cache", threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 encoder: Optional[Any] = None, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        """Response cache matched by prompt embedding similarity; pass encoder to share an already loaded model."""
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.encoder = encoder if encoder is not None else load_embedding_model('all-MiniLM-L6-v2')
+        self.dimension = self.encoder.get_sentence_embedding_dimension()
+        self._vectors_path = os.path.join(db_path, "vectors.f32")  # embedding of every entry, in entry order
+        self._entries_path = os.path.join(db_path, "entries.jsonl")  # one [model, scope, response] line per entry
+
+        # Inner product over L2-normalized embeddings is cosine similarity
+        self.index = faiss.IndexFlatIP(self.dimension)
+        self.entries = []
+        self._load()
+
+    def _load(self) -> None:
+        """Load the persisted embeddings and their (model, scope, response) entries."""
+        if not os.path.exists(self._entries_path):
+            self._load_legacy()
+            return
+        try:
+            entries = []
+            with open(self._entries_path, 'r') as f:
+                for line in f:
+                    try:
+                        entries.append(tuple(json.loads(line)))
+                    except json.JSONDecodeError:
+                        break
+            vectors = np.fromfile(self._vectors_path, dtype=np.float32) if os.path.exists(self._vectors_path) else np.zeros(0, np.float32)
+            vectors = vectors[:len(vectors) // self.dimension * self.dimension].reshape(-1, self.dimension)
+            
+            # An add interrupted between the two appends leaves one file a row ahead; keep the rows both have
+            count = min(len(entries), len(vectors))
+            self.index.add(np.ascontiguousarray(vectors[:count]))
+            self.entries = entries[:count]
+            if count != len(entries) or count != len(vectors):
+                self._rewrite()
+        except Exception as e:
+            self.logger.warning(f"Error loading semantic cache: {str(e)}, starting empty")
+            self.index = faiss.IndexFlatIP(self.dimension)
+            self.entries = []
+
+    def _load_legacy(self) -> None:
+        """Convert an index.faiss and entries.json pair written by older versions to the append-only files."""
+        index_path = os.path.join(self.db_path, "index.faiss")
+        entries_path = os.path.join(self.db_path, "entries.json")
+        if not (os.path.exists(index_path) and os.path.exists(entries_path)):
+            return
+        try:
+            index = faiss.read_index(index_path)
+            with open(entries_path, 'r') as f:
+                entries = json.load(f)
+            if index.ntotal == len(entries) and index.d == self.dimension:
+                self.index.add(index.reconstruct_n(0, index.ntotal))
+                self.entries = [tuple(entry) for entry in entries]
+                self._rewrite()
+            else:
+                self.logger.warning("Semantic cache index and entries are out of sync, starting empty")
+            os.remove(index_path)
+            os.remove(entries_path)
+        except Exception as e:
+            self.logger.warning(f"Error loading semantic cache: {str(e)}, starting empty")
+
+    def fits(self, text: str) -> bool:
+        """Whether the encoder reads all of text; longer texts are truncated and would match on their head alone."""
+        return len(self.encoder.tokenizer(text)['input_ids']) <= self.encoder.max_seq_length
+    
+    def embed(self, prompt: str) -> np.ndarray:
+        """Embed a prompt as a normalized float32 row vector."""
+        return self.encoder.encode([prompt], normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    def lookup(self, embedding: np.ndarray, model: str, scope: str = "") -> Optional[str]:
+        """Return the response of the nearest similar enough stored prompt with the same model and scope."""
+        with self._lock:
+            if self.index.ntotal == 0:
+                return None
+            
+            # Entries of other models or scopes may be nearer, so check the first few neighbours in order
+            scores, ids = self.index.search(embedding, min(SEMANTIC_LOOKUP_K, self.index.ntotal))
+            for score, i in zip(scores[0], ids[0]):
+                if score < self.threshold:
+                    break
+                *entry_key, response = self.entries[i]
+                if tuple(entry_key) == (model, scope):
+                    return response
+            return None
+
+    def add(self, embedding: np.ndarray, model: str, response: str, scope: str = "") -> None:
+        """Store a response under the prompt embedding and persist the cache; scope is what else must match on lookup."""
+        try:
+            with self._lock:
+                self.index.add(embedding)
+                self.entries.append((model, scope, response))
+                
+                # Past max_entries the oldest entries are dropped in one compaction, otherwise both files only grow
+                if len(self.entries) > self.max_entries:
+                    self._evict()
+                    return
+                os.makedirs(self.db_path, exist_ok=True)
+                with open(self._vectors_path, 'ab') as f:
+                    f.write(np.ascontiguousarray(embedding, dtype=np.float32).tobytes())
+                with open(self._entries_path, 'a') as f:
+                    f.write(json.dumps([model, scope, response]) + "\n")
+        except Exception as e:
+            self.logger.error(f"Error writing semantic cache: {str(e)}")
+
+    def _evict(self) -> None:
+        """Keep the newest three quarters of max_entries, so compactions are rare, and rewrite both files."""
+        keep = self.max_entries * 3 // 4
+        start = len(self.entries) - keep
+        vectors = self.index.reconstruct_n(start, keep) if keep else np.zeros((0, self.dimension), np.float32)
+        self.index = faiss.IndexFlatIP(self.dimension)
+        self.index.add(vectors)
+        self.entries = self.entries[start:]
+        self._rewrite()
+        self.logger.info(f"Evicted {start} semantic cache entries")
+
+    def _rewrite(self) -> None:
+        """Write every entry and its embedding to fresh files, replacing the old ones."""
+        os.makedirs(self.db_path, exist_ok=True)
+        vectors = self.index.reconstruct_n(0, self.index.ntotal) if self.index.ntotal else np.zeros((0, self.dimension), np.float32)
+        with open(self._vectors_path + ".tmp", 'wb') as f:
+            f.write(vectors.tobytes())
+        with open(self._entries_path + ".tmp", 'w') as f:
+            f.writelines(json.dumps(list(entry)) + "\n" for entry in self.entries)
+        
+        # Without an entries file the cache loads empty, so a crash between the renames never pairs old rows with new
+        if os.path.exists(self._entries_path):
+            os.remove(self._entries_path)
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._entries_path + ".tmp", self._entries_path)
@@ -1,63 +1,364 @@
 import os
+import re
 import json
+import math
+import asyncio
+import time
+import orjson
+import heapq
+import hashlib
 import logging
+import threading
 import requests
-from typing import Dict, List, Optional, Union, Any, Generator
+from typing import Dict, List, Optional, Union, Any, AsyncGenerator, Generator, Tuple
+from string import Template
+from collections import Counter
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from requests.exceptions import RequestException
+from .llm_cache import LLMCache, SemanticCache
+
+def _dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string with orjson, optionally pretty-printed for prompts.
+    
+    Keys are sorted so equal objects always serialize to the same prompt bytes.
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(obj, option=option).decode()
+
+_loads = orjson.loads
+
+_RESPONSE_MARKER = b'"response":"'
+_DONE_MARKER = b'"done":true'
+
+def _parse_stream_line(line: bytes) -> Tuple[Optional[str], bool]:
+    """Extract (token text, done) from one NDJSON chunk of /api/generate.
+    
+    Unescaped tokens are sliced straight out of the bytes; anything else goes through orjson.
+    """
+    start = line.find(_RESPONSE_MARKER)
+    if start != -1:
+        start += len(_RESPONSE_MARKER)
+        end = line.find(b'"', start)
+        if end != -1 and line.find(b'\\', start, end) == -1:
+            return line[start:end].decode(), _DONE_MARKER in line
+    
+    chunk = _loads(line)
+    return chunk.get('response'), bool(chunk.get('done'))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def _bm25_top_k(query: str, documents: Dict[str, str], k: int, k1: float = 1.5, b: float = 0.75) -> List[str]:
+    """Return the keys of the k documents scoring highest for query under Okapi BM25."""
+    query_terms = set(_TOKEN_RE.findall(query.lower()))
+    tokenized = {key: _TOKEN_RE.findall(text.lower()) for key, text in documents.items()}
+    if not query_terms or not tokenized:
+        return list(documents)[:k]
+    
+    # Document frequency of each query term across the collection
+    doc_freq = Counter(term for tokens in tokenized.values() for term in query_terms.intersection(tokens))
+    n_docs = len(tokenized)
+    avg_len = sum(len(tokens) for tokens in tokenized.values()) / n_docs or 1.0
+    
+    scores = {}
+    for key, tokens in tokenized.items():
+        counts = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if tf:
+                idf = math.log(1 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + norm)
+        scores[key] = score
+    
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+# Files ranked per find_relevant_files request, and how many survive the merge across requests
+RELEVANCE_SHARD_SIZE = 50
+RELEVANCE_TOP_K = 10
+RELEVANCE_SHARD_MAX_TOKENS = 4096
+
+def _parse_json_response(text: str) -> Any:
+    """Parse a JSON-mode reply, returning the raw text if the model did not produce valid JSON."""
+    try:
+        return _loads(text)
+    except json.JSONDecodeError:
+        return text
+
+def _merge_rankings(responses: List[str], top_k: int) -> str:
+    """Merge per-shard JSON rankings into one ranked list of the top_k files; unparseable replies are appended as-is."""
+    ranked = []
+    unparsed = []
+    for response in responses:
+        try:
+            entries = _loads(response)
+        except json.JSONDecodeError:
+            if response:
+                unparsed.append(response)
+            continue
+        
+        if isinstance(entries, dict):
+            entries = entries.get('files', [])
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict) or not entry.get('file'):
+                continue
+            try:
+                score = float(entry.get('score', 0))
+            except (TypeError, ValueError):
+                score = 0.0
+            ranked.append((score, str(entry['file']), str(entry.get('reason', ''))))
+    
+    top = heapq.nlargest(top_k, ranked, key=itemgetter(0))
+    lines = [f"{rank}. {path} (score {score:g}): {reason}" for rank, (score, path, reason) in enumerate(top, 1)]
+    return '\n'.join(lines + unparsed)
+
+# Paragraphs shorter than this cost less to repeat than to reference
+DEDUP_MIN_CHARS = 64
+
+# Level-two headings inside a summary, demoted so only the pack's "## path" lines are level two
+_SUMMARY_HEADING_RE = re.compile(r"(?m)^## ")
+
+def _dedup_chunks(blocks: List[Tuple[str, str]]) -> str:
+    """Render (path, summary) blocks as a "## path" pack, replacing repeated paragraphs with references to their first tagged occurrence."""
+    paragraphs = []
+    for file_path, summary in blocks:
+        summary = _SUMMARY_HEADING_RE.sub("### ", summary)
+        for i, paragraph in enumerate(summary.split("\n\n")):
+            # Headings inside a summary are ordinary paragraphs; only the block's own path is a header
+            header = f"## {file_path}\n" if i == 0 else ''
+            digest = hashlib.blake2b(paragraph.encode(), digest_size=16).digest() if len(paragraph) >= DEDUP_MIN_CHARS else None
+            paragraphs.append((header, paragraph, digest))
+    
+    # Only chunks that occur more than once get a §k tag
+    counts = Counter(digest for _, _, digest in paragraphs if digest is not None)
+    dedup_table = {}
+    out = []
+    for header, paragraph, digest in paragraphs:
+        if digest is None or counts[digest] == 1:
+            out.append(header + paragraph)
+        elif digest in dedup_table:
+            out.append(f"{header}(see §{dedup_table[digest]})")
+        else:
+            dedup_table[digest] = len(dedup_table) + 1
+            out.append(f"{header}[§{dedup_table[digest]}] {paragraph}")
+    return ''.join(f"{chunk}\n\n" for chunk in out)
+
+# One keep-alive connection pool shared by every OllamaClient, built on first use
+# Every request is a POST, so retries cover all methods; Ollama answers 503 when its queue is full and a proxy
+# in front of it may rate limit with 429, both honouring Retry-After. The last response is returned as-is.
+_RETRY = Retry(total=2, backoff_factor=0.2, allowed_methods=None, status_forcelist=(429, 503), raise_on_status=False)
+_SHARED_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """Return the process-wide Ollama session, retrying dropped connections and busy responses."""
+    global _SHARED_SESSION
+    with _SESSION_LOCK:
+        if _SHARED_SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=64, max_retries=_RETRY)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SHARED_SESSION = session
+        return _SHARED_SESSION
+
+# Seconds a fetched /api/tags model list is reused before asking the server again
+TAGS_CACHE_TTL = 30.0
+
+# Seconds a cached non-streaming response is served before the model is asked again
+RESPONSE_CACHE_TTL = 3600
+
+# Seconds a per-file summary is kept; entries are keyed by file content so edits miss on their own
+SUMMARY_CACHE_TTL = 30 * 24 * 3600
+
+# Invariant instructions go first in every prompt so repeated calls share the longest possible cached prefix
+ANALYZE_SYSTEM_PREAMBLE = """Please analyze the codebase described below and provide a comprehensive overview.
+
+Please provide:
+1. Overall architecture and structure
+2. Key components and their relationships
+3. Main functionality and purpose
+4. Notable patterns or design decisions
+5. Potential areas for improvement
+
+Respond with a JSON object of the form {"architecture": "<overview>", "components": ["<component and its relationships>"], "functionality": "<main purpose>", "patterns": ["<pattern or design decision>"], "improvements": ["<area for improvement>"]}."""
+
+QUERY_SYSTEM_PREAMBLE = """Please answer the question below about the codebase, using the given context.
+
+Please provide:
+1. A direct answer to the question
+2. Relevant code snippets or examples
+3. Additional context or related information
+4. Any caveats or limitations
+
+Respond with a JSON object of the form {"answer": "<direct answer>", "snippets": ["<relevant code>"], "context": "<additional context>", "caveats": ["<caveat or limitation>"]}."""
+
+SUGGEST_SYSTEM_PREAMBLE = """Please suggest changes to the code below based on the given description.
+
+Please provide:
+1. The modified code with changes
+2. Explanation of the changes
+3. Any additional considerations
+4. Potential impact of the changes
+
+Respond with a JSON object of the form {"modified_code": "<full modified code>", "explanation": "<explanation of the changes>", "considerations": ["<additional consideration>"], "impact": "<potential impact>"}."""
+
+RELEVANCE_SYSTEM_PREAMBLE = """You are CodeGenie, an expert code assistant. Your task is to identify which files in a codebase are most relevant to a specific query or feature request. When analyzing relevance:
+1. Consider both direct relevance (files that would need to be modified) and contextual relevance (files that provide necessary context)
+2. Rank files by relevance, with the most relevant first
+3. Provide a brief explanation of why each file is relevant
+4. Be comprehensive - don't miss files that might be affected
+5. Consider dependencies and potential ripple effects of changes
+
+Be precise and thorough in your analysis."""
+
+SUMMARY_SYSTEM_PREAMBLE = """Please summarize the source file below for a developer who has not seen it.
+
+Describe in a few sentences its purpose, the main classes and functions it defines, and how it relates to the rest of the codebase. Do not reproduce the code."""
+
+RELEVANCE_INSTRUCTIONS = """Below are summaries of some files in the codebase, followed by the query. Please identify and rank the files among them most relevant to the query. For each file, explain why it's relevant and how it relates to the query.
+
+Respond with a JSON object of the form {"files": [{"file": "<path>", "score": <relevance from 0 to 10>, "reason": "<why it is relevant>"}]}, most relevant first. Leave out files that are not relevant."""
+
+# Separates the shared preamble from the per-call content
+DYNAMIC_SEPARATOR = "\n\n---\nDYNAMIC:\n"
+
+# Bump a template's version whenever its text changes so input-keyed cache entries for it stop matching
+TEMPLATE_VERSIONS = {"analyze": "v1", "summary": "v1"}
+
+# Full prompt templates, assembled once at import and filled per call; $-placeholders leave the JSON schemas' braces alone
+ANALYZE_TMPL = Template(ANALYZE_SYSTEM_PREAMBLE + DYNAMIC_SEPARATOR + "Codebase Summary:\n$summary\n\nFiles by language:\n$files\n\nDependencies:\n$deps")
+QUERY_TMPL = Template(QUERY_SYSTEM_PREAMBLE + DYNAMIC_SEPARATOR + "Context:\n$context\n\nQuestion: $query")
+SUGGEST_TMPL = Template(SUGGEST_SYSTEM_PREAMBLE + DYNAMIC_SEPARATOR + "Code:\n$code\n\nSuggestion:\n$suggestion")
+SUMMARY_TMPL = Template(SUMMARY_SYSTEM_PREAMBLE + DYNAMIC_SEPARATOR + "File: $path\n\n$content")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class OllamaClient:
-    def __init__(self, model: str = "llama3:8b"):
+    def __init__(self, model: str = "llama3:8b", cache: Optional[LLMCache] = None, cache_max_temperature: float = 0.3,
+                 semantic_cache: Optional[SemanticCache] = None, cache_path: Optional[str] = None):
         self.model = model
         self.base_url = "http://localhost:11434"
         self.logger = logging.getLogger(__name__)
+        
+        # Non-streaming responses at or below cache_max_temperature are treated as deterministic and cached;
+        # without a cache or cache_path (or LLM_CACHE_PATH) they are only kept in memory for this client
+        if cache is None:
+            cache = LLMCache(cache_path or os.getenv("LLM_CACHE_PATH", ":memory:"))
+        self.cache = cache
+        self.cache_max_temperature = cache_max_temperature
+        self.cache_stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()  # generate_many updates cache_stats from worker threads
+        
+        # Optional fallback that also answers paraphrases of earlier prompts
+        self.semantic_cache = semantic_cache
+        
+        # Reuse keep-alive connections to the Ollama server across calls and clients
+        self._session = _get_session()
+        
+        # Last /api/tags response as (base_url, data) and when it was fetched
+        self._tags_cache = None
+        self._tags_ts = 0.0
+        
+        # Ask the server to keep the model loaded between calls; (base_url, model) last warmed up
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self._warmed = None
+        
         self.logger.info(f"Initialized OllamaClient with model: {model}")
     
+    def _count(self, stat: str) -> None:
+        """Increment one of cache_stats, safely from any thread."""
+        with self._stats_lock:
+            self.cache_stats[stat] += 1
+    
+    def close(self) -> None:
+        """Close the response cache; the shared connection pool stays open for other clients."""
+        self.cache.close()
+    
+    def _fetch_tags(self, ttl: float = TAGS_CACHE_TTL) -> Any:
+        """Fetch the /api/tags response, reusing it for ttl seconds."""
+        now = time.monotonic()
+        if self._tags_cache is not None and self._tags_cache[0] == self.base_url and now - self._tags_ts < ttl:
+            return self._tags_cache[1]
+        
+        self.logger.debug("Attempting to get available models from %s/api/tags", self.base_url)
+        response = self._session.get(f"{self.base_url}/api/tags")
+        self.logger.debug("Ollama server response status: %s", response.status_code)
+        
+        if response.status_code != 200:
+            self.logger.error(f"Ollama server returned non-200 status code: {response.status_code}")
+            self.logger.error(f"Response content: {response.text}")
+        response.raise_for_status()
+        
+        # Parse the response
+        data = _loads(response.content)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Ollama server response data: %s", data)
+        
+        self._tags_cache = (self.base_url, data)
+        self._tags_ts = now
+        return data
+    
+    def _parse_model_names(self, data: Any) -> List[str]:
+        """Validate a /api/tags response and return its model names, or [] if there are none."""
+        if not isinstance(data, dict):
+            self.logger.error("Invalid response format from Ollama server")
+            return []
+            
+        models = data.get("models", [])
+        if not models:
+            self.logger.warning("No models available on Ollama server")
+            return []
+            
+        model_names = [model.get("name") for model in models if isinstance(model, dict)]
+        if not model_names:
+            self.logger.error("Invalid model format in Ollama response")
+            return []
+        
+        self.logger.info(f"Available models: {', '.join(model_names)}")
+        return model_names
+    
+    def warmup(self) -> None:
+        """Load the model on the server in the background so the first real request does not pay for it."""
+        target = (self.base_url, self.model)
+        if self._warmed == target:
+            return
+        self._warmed = target
+        
+        data = {
+            "model": self.model,
+            "prompt": " ",
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_predict": 1}
+        }
+        
+        def run():
+            try:
+                self._session.post(f"{target[0]}/api/generate", json=data).close()
+            except Exception as e:
+                self.logger.warning(f"Error warming up model {target[1]}: {str(e)}")
+        
+        threading.Thread(target=run, daemon=True).start()
+    
     def test_connection(self) -> bool:
         """Test connection to Ollama server."""
         try:
             # First try to connect to the server
             self.logger.info(f"Testing connection to Ollama server at {self.base_url}")
-            self.logger.info(f"Attempting to get available models from {self.base_url}/api/tags")
-            
-            response = requests.get(f"{self.base_url}/api/tags")
-            self.logger.info(f"Ollama server response status: {response.status_code}")
-            self.logger.info(f"Ollama server response headers: {response.headers}")
-            
-            if response.status_code != 200:
-                self.logger.error(f"Ollama server returned non-200 status code: {response.status_code}")
-                self.logger.error(f"Response content: {response.text}")
-                return False
-                
-            response.raise_for_status()
-            
-            # Parse the response
-            data = response.json()
-            self.logger.info(f"Ollama server response data: {data}")
-            
-            if not isinstance(data, dict):
-                self.logger.error("Invalid response format from Ollama server")
-                return False
-                
-            # Check if models are available
-            models = data.get("models", [])
-            if not models:
-                self.logger.warning("No models available on Ollama server")
-                return False
-                
-            # Check if our model is available
-            model_names = [model.get("name") for model in models if isinstance(model, dict)]
-            self.logger.info(f"Available models: {model_names}")
-            
+            model_names = self._parse_model_names(self._fetch_tags())
             if not model_names:
-                self.logger.error("Invalid model format in Ollama response")
                 return False
                 
+            # Check if our model is available
             if self.model in model_names:
                 self.logger.info(f"Successfully connected to Ollama server. Model '{self.model}' is available.")
+                self.warmup()
                 return True
             else:
                 # Try to find a similar model
@@ -67,6 +368,7 @@ class OllamaClient:
                     # Use the first similar model
                     self.model = similar_models[0]
                     self.logger.info(f"Using similar model: {self.model}")
+                    self.warmup()
                     return True
                 else:
                     self.logger.warning(f"Connected to Ollama server, but model '{self.model}' is not available. Available models: {', '.join(model_names)}")
@@ -85,66 +387,183 @@ class OllamaClient:
             self.logger.error(f"Unexpected error testing Ollama connection: {str(e)}")
             return False
     
-    def generate(self, prompt: str, temperature: float = 0.7, stream: bool = True) -> Union[str, Generator[str, None, None]]:
-        """Generate text using the Ollama API."""
+    def _cache_key(self, prompt: str, temperature: float, system_prompt: Optional[str] = None,
+                   max_tokens: Optional[int] = None, response_format: Optional[str] = None) -> str:
+        """Hash everything that shapes the response into a response cache key."""
+        payload = orjson.dumps({
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "system": system_prompt,
+            "max_tokens": max_tokens,
+            "format": response_format
+        }, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+    
+    def _input_cache_key(self, template: str, *inputs: Any) -> str:
+        """Hash a template's version and its raw inputs, so a hit needs no prompt rendering."""
+        digest = hashlib.blake2b(f"{template}|{TEMPLATE_VERSIONS[template]}|{self.model}".encode(), digest_size=16)
+        for value in inputs:
+            digest.update(b"|")
+            digest.update(orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS))
+        return f"input:{digest.hexdigest()}"
+    
+    def generate(self, prompt: str, temperature: float = 0.7, stream: bool = True, system_prompt: Optional[str] = None,
+                 max_tokens: Optional[int] = None, response_format: Optional[str] = None,
+                 semantic: bool = True) -> Union[str, Generator[str, None, None]]:
+        """Generate text using the Ollama API; response_format="json" constrains the output to valid JSON.
+        
+        semantic=False skips the paraphrase cache, for prompts whose near-duplicates need different answers.
+        """
         try:
+            # Serve repeated low-temperature requests from the response cache
+            cache_key = None
+            embedding = None
+            if not stream and temperature <= self.cache_max_temperature:
+                cache_key = self._cache_key(prompt, temperature, system_prompt, max_tokens, response_format)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self._count("hits")
+                    return cached
+                
+                # Fall back to the nearest earlier prompt when it is a close enough paraphrase: only the per-call
+                # text is compared (and only if the encoder reads all of it), and everything else must match exactly
+                static, separator, dynamic = prompt.partition(DYNAMIC_SEPARATOR)
+                if not separator:
+                    static, dynamic = "", prompt
+                if semantic and self.semantic_cache is not None and self.semantic_cache.fits(dynamic):
+                    semantic_scope = hashlib.blake2b(
+                        orjson.dumps([static, system_prompt, response_format, max_tokens]), digest_size=16
+                    ).hexdigest()
+                    embedding = self.semantic_cache.embed(dynamic)
+                    cached = self.semantic_cache.lookup(embedding, self.model, semantic_scope)
+                    if cached is not None:
+                        self._count("semantic_hits")
+                        return cached
+                self._count("misses")
+            
             url = f"{self.base_url}/api/generate"
             data = {
                 "model": self.model,
                 "prompt": prompt,
                 "temperature": temperature,
-                "stream": stream
+                "stream": stream,
+                "keep_alive": self.keep_alive
             }
+            if system_prompt:
+                data["system"] = system_prompt
+            if max_tokens:
+                data.setdefault("options", {})["num_predict"] = max_tokens
+            if response_format:
+                data["format"] = response_format
             
-            response = requests.post(url, json=data, stream=stream)
-            self.logger.info(f"The response from LLM is:")
-            self.logger.info(response)
+            response = self._session.post(url, json=data, stream=stream)
+            self.logger.debug("The response from LLM is: %s", response)
             
             if stream:
                 def generate_stream():
-                    for line in response.iter_lines():
-                        if line:
+                    # Release the connection back to the session pool once the stream is consumed
+                    with response:
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
                             try:
-                                chunk = json.loads(line)
-                                if 'response' in chunk:
-                                    yield chunk['response']
+                                text, done = _parse_stream_line(line)
                             except json.JSONDecodeError:
                                 continue
+                            
+                            # Only the token text matters; skip empty tokens and stop at the final chunk
+                            if text:
+                                yield text
+                            if done:
+                                break
                 return generate_stream()
             else:
-                result = response.json()
-                return result.get('response', '')
+                result = _loads(response.content)
+                text = result.get('response', '')
+                if cache_key is not None and text and 'error' not in result:
+                    self.cache.set(cache_key, text, ttl=RESPONSE_CACHE_TTL)
+                    if embedding is not None:
+                        self.semantic_cache.add(embedding, self.model, text, semantic_scope)
+                return text
                 
         except Exception as e:
             self.logger.error(f"Error generating text: {str(e)}")
             return ""
     
+    async def agenerate(self, prompt: str, temperature: float = 0.7) -> str:
+        """Generate text without blocking the event loop."""
+        return await asyncio.to_thread(self.generate, prompt, temperature, False)
+    
+    async def astream(self, prompt: str, temperature: float = 0.7) -> AsyncGenerator[str, None]:
+        """Stream generated tokens without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        finished = object()
+        
+        # The blocking stream runs in a worker thread and hands each token to the loop as it arrives
+        def pump():
+            try:
+                for token in self.generate(prompt, temperature, stream=True):
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, finished)
+        
+        worker = loop.run_in_executor(None, pump)
+        while (token := await tokens.get()) is not finished:
+            yield token
+        await worker
+    
+    async def amap_generate(self, prompts: List[str], temperature: float = 0.7, concurrency: int = 8) -> List[str]:
+        """Generate responses for several prompts concurrently, with at most concurrency requests in flight."""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt, temperature)
+        
+        return list(await asyncio.gather(*(run(prompt) for prompt in prompts)))
+    
+    def generate_many(self, prompts: List[str], temperature: float = 0.7, max_concurrency: int = 4,
+                      **generate_kwargs: Any) -> List[str]:
+        """Generate responses for several prompts with up to max_concurrency requests in flight."""
+        if not prompts:
+            return []
+        
+        # Requests share the session's connection pool; Ollama serves them from its parallel slots
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(prompts))) as executor:
+            return list(executor.map(lambda prompt: self.generate(prompt, temperature, stream=False, **generate_kwargs), prompts))
+    
     def analyze_codebase(self, codebase: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze the entire codebase."""
         try:
-            prompt = f"""Please analyze this codebase and provide a comprehensive overview:
-
-Codebase Summary:
-{json.dumps(codebase['summary'], indent=2)}
-
-Files:
-{json.dumps([{'path': f['path'], 'language': f['language']} for f in codebase['files']], indent=2)}
-
-Dependencies:
-{json.dumps(codebase['dependencies'], indent=2)}
-
-Please provide:
-1. Overall architecture and structure
-2. Key components and their relationships
-3. Main functionality and purpose
-4. Notable patterns or design decisions
-5. Potential areas for improvement
-
-Format your response in a clear, structured way."""
-
-            response = self.generate(prompt, temperature=0.3)
-            if isinstance(response, Generator):
-                response = ''.join(response)
+            # Look the inputs up before paying for rendering a large codebase into the prompt
+            key = self._input_cache_key(
+                "analyze",
+                codebase['summary'],
+                sorted((f['path'], f['language']) for f in codebase['files']),
+                codebase['dependencies']
+            )
+            text = self.cache.get(key)
+            if text is not None:
+                self._count("hits")
+            else:
+                # Group paths under their language so each language name is written once
+                files_by_language = {}
+                for f in codebase['files']:
+                    files_by_language.setdefault(f['language'], []).append(f['path'])
+                
+                prompt = ANALYZE_TMPL.substitute(
+                    summary=_dumps(codebase['summary'], indent=True),
+                    files=_dumps(files_by_language, indent=True),
+                    deps=_dumps(codebase['dependencies'], indent=True)
+                )
+                
+                text = self.generate(prompt, temperature=0.3, stream=False, response_format="json")
+                if text:
+                    self.cache.set(key, text, ttl=RESPONSE_CACHE_TTL)
+            
+            response = _parse_json_response(text)
             
             return {
                 "analysis": response,
@@ -161,24 +580,9 @@ Format your response in a clear, structured way."""
     def query_code(self, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Query the codebase with a specific question."""
         try:
-            prompt = f"""Please answer this question about the codebase:
-
-Question: {query}
-
-Context:
-{json.dumps(context, indent=2)}
+            prompt = QUERY_TMPL.substitute(context=_dumps(context, indent=True), query=query)
 
-Please provide:
-1. A direct answer to the question
-2. Relevant code snippets or examples
-3. Additional context or related information
-4. Any caveats or limitations
-
-Format your response in a clear, structured way."""
-
-            response = self.generate(prompt, temperature=0.3)
-            if isinstance(response, Generator):
-                response = ''.join(response)
+            response = _parse_json_response(self.generate(prompt, temperature=0.3, stream=False, response_format="json"))
             
             return {
                 "answer": response,
@@ -195,25 +599,9 @@ Format your response in a clear, structured way."""
     def suggest_code_changes(self, code: str, suggestion: str) -> Dict[str, Any]:
         """Suggest code changes based on a description."""
         try:
-            prompt = f"""Please suggest code changes based on this description:
-
-Code:
-{code}
-
-Suggestion:
-{suggestion}
+            prompt = SUGGEST_TMPL.substitute(code=code, suggestion=suggestion)
 
-Please provide:
-1. The modified code with changes
-2. Explanation of the changes
-3. Any additional considerations
-4. Potential impact of the changes
-
-Format your response in a clear, structured way."""
-
-            response = self.generate(prompt, temperature=0.3)
-            if isinstance(response, Generator):
-                response = ''.join(response)
+            response = _parse_json_response(self.generate(prompt, temperature=0.3, stream=False, response_format="json"))
             
             return {
                 "suggestion": response,
@@ -227,55 +615,84 @@ Format your response in a clear, structured way."""
                 "success": False
             }
 
+    def summarize_files(self, files: List[Dict[str, str]], max_concurrency: int = 8, cached_only: bool = False) -> Dict[str, str]:
+        """Summarize {'path', 'content'} files, re-running the model only for path and content pairs it has not summarized before.
+        
+        With cached_only, files without a cached summary are left out instead of being summarized.
+        """
+        summaries = {}
+        missing = []
+        for f in files:
+            # The prompt names the file, so the path is part of the key along with the content
+            key = self._input_cache_key("summary", f['path'], f['content'])
+            cached = self.cache.get(key)
+            if cached is not None:
+                summaries[f['path']] = cached
+            else:
+                missing.append((f, key))
+        
+        if missing and not cached_only:
+            self.logger.info(f"Summarizing {len(missing)} of {len(files)} files")
+            prompts = [SUMMARY_TMPL.substitute(path=f['path'], content=f['content']) for f, _ in missing]
+            results = self.generate_many(prompts, temperature=0.3, max_concurrency=max_concurrency, semantic=False)
+            for (f, key), summary in zip(missing, results):
+                summaries[f['path']] = summary
+                if summary:
+                    self.cache.set(key, summary, ttl=SUMMARY_CACHE_TTL)
+        
+        return summaries
+    
     def set_model(self, model_name: str) -> None:
         """Change the model being used."""
         self.model = model_name
+        self._tags_cache = None
         self.logger.info(f"Model changed to: {model_name}")
     
-    def find_relevant_files(self, query: str, file_list: List[str], file_summaries: Dict[str, str]) -> Dict[str, Any]:
-        """Identify which files are most relevant to a specific query."""
-        system_prompt = """You are CodeGenie, an expert code assistant. Your task is to identify which files in a codebase are most relevant to a specific query or feature request. When analyzing relevance:
-1. Consider both direct relevance (files that would need to be modified) and contextual relevance (files that provide necessary context)
-2. Rank files by relevance, with the most relevant first
-3. Provide a brief explanation of why each file is relevant
-4. Be comprehensive - don't miss files that might be affected
-5. Consider dependencies and potential ripple effects of changes
-
-Be precise and thorough in your analysis."""
+    def find_relevant_files(self, query: str, file_list: List[str], file_summaries: Dict[str, str],
+                            max_files: Optional[int] = None,
+                            max_concurrency: int = 4) -> Dict[str, Any]:
+        """Identify which files are most relevant to a specific query.
+        
+        max_files, when given, keeps only the BM25 top matches of file_summaries for the query.
+        Files are ranked in shards of RELEVANCE_SHARD_SIZE concurrently and the rankings merged.
+        """
+        if max_files is not None and len(file_summaries) > max_files:
+            keep = _bm25_top_k(query, file_summaries, max_files)
+            file_summaries = {file_path: file_summaries[file_path] for file_path in keep}
         
-        # Create a context with summaries of all files
-        context = f"Query: {query}\n\nHere are summaries of files in the codebase:\n\n"
+        # Emit files in path order so the same codebase always renders byte-identical summaries
+        blocks = sorted(file_summaries.items())
         
-        for file_path, summary in file_summaries.items():
-            context += f"## {file_path}\n{summary}\n\n"
+        # Fixed-size shards bound each prompt and keep its prefix stable when files change in other shards;
+        # boilerplate repeated within a shard is sent once and referenced after that
+        packs = [_dedup_chunks(blocks[i:i + RELEVANCE_SHARD_SIZE]) for i in range(0, len(blocks), RELEVANCE_SHARD_SIZE)] or ['']
+        pack_version = hashlib.md5(''.join(packs).encode()).hexdigest()[:12]
+        self.logger.info(f"Finding relevant files in {len(packs)} shards with summaries pack {pack_version}")
         
-        prompt = f"{context}\n\nPlease identify and rank the files most relevant to this query. For each file, explain why it's relevant and how it relates to the query."
+        # Instructions first, then the shard's summaries, with the query last
+        prompts = [''.join((RELEVANCE_INSTRUCTIONS, DYNAMIC_SEPARATOR, pack, f"Query: {query}")) for pack in packs]
         
-        return self.generate(prompt, system_prompt=system_prompt, temperature=0.3, max_tokens=16384)
+        try:
+            responses = self.generate_many(prompts, temperature=0.3, max_concurrency=max_concurrency,
+                                           system_prompt=RELEVANCE_SYSTEM_PREAMBLE, max_tokens=RELEVANCE_SHARD_MAX_TOKENS,
+                                           response_format="json", semantic=False)
+            
+            return {
+                "response": _merge_rankings(responses, RELEVANCE_TOP_K),
+                "success": True
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error finding relevant files: {str(e)}")
+            return {
+                "error": str(e),
+                "success": False
+            }
 
     def get_available_models(self) -> List[str]:
         """Get list of available models from Ollama server."""
         try:
-            response = requests.get(f"{self.base_url}/api/tags")
-            response.raise_for_status()
-            
-            data = response.json()
-            if not isinstance(data, dict):
-                self.logger.error("Invalid response format from Ollama server")
-                return []
-                
-            models = data.get("models", [])
-            if not models:
-                self.logger.warning("No models available on Ollama server")
-                return []
-                
-            model_names = [model.get("name") for model in models if isinstance(model, dict)]
-            if not model_names:
-                self.logger.error("Invalid model format in Ollama response")
-                return []
-                
-            self.logger.info(f"Available models: {', '.join(model_names)}")
-            return model_names
+            return self._parse_model_names(self._fetch_tags())
                 
         except requests.exceptions.ConnectionError:
             self.logger.error("Failed to connect to Ollama server. Is it running?")
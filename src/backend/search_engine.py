@@ -1,24 +1,211 @@
 import os
+import sys
 import json
+import hashlib
 import logging
 import re
+import threading
 from typing import Dict, List, Set, Tuple, Optional, Any
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import faiss
+from .vector_db import encode_query, load_embedding_model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Seconds a node's cached detailed summaries stay valid; entries are keyed by content so staleness is not a concern
+SUMMARY_CACHE_TTL = 30 * 24 * 3600.0
+
+# Most LLM requests in flight at once across a whole graph build (file workers and their per-method fan-out
+# share it); matches the parallel slots of the local Ollama server
+LLM_MAX_CONCURRENCY = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Set STRICT_EMBEDDING_CACHE=1 to raise instead of warn when a query has to encode texts the graph build should have
+STRICT_EMBEDDING_CACHE = os.getenv("STRICT_EMBEDDING_CACHE", "0") == "1"
+
+# Rows of a quantized matrix widened to float32 at once when scoring a query
+SCORE_BLOCK_ROWS = 4096
+
+# Language of each known extension; one interned string per language is shared by every node
+_FILE_TYPES = {
+    ext: sys.intern(lang)
+    for lang, extensions in {
+        'python': ['.py'],
+        'typescript': ['.ts', '.tsx'],
+        'javascript': ['.js', '.jsx'],
+        'html': ['.html'],
+        'css': ['.css'],
+        'json': ['.json'],
+        'markdown': ['.md']
+    }.items()
+    for ext in extensions
+}
+_UNKNOWN_FILE_TYPE = sys.intern('unknown')
+
+# Longest file / method text sent in a summary prompt; summaries plateau well before whole large files
+PROMPT_MAX_CHARS = 12000
+METHOD_PROMPT_MAX_CHARS = 4000
+
+def _clip_for_prompt(text: str, max_chars: int) -> str:
+    """Keep the head and tail of text that is longer than max_chars."""
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n...\n{text[-half:]}"
+
+# Patterns used while building every CodeNode, compiled once at import
+_PY_METHOD_PATTERNS = [
+    (re.compile(r'def\s+(\w+)\s*\((.*?)\):'), 'function'),
+    (re.compile(r'class\s+(\w+)\s*\((.*?)\):'), 'class'),
+    (re.compile(r'class\s+(\w+):'), 'class')
+]
+_JS_METHOD_PATTERNS = [
+    (re.compile(r'function\s+(\w+)\s*\((.*?)\)\s*{'), 'function'),
+    (re.compile(r'const\s+(\w+)\s*=\s*function\s*\((.*?)\)\s*{'), 'function'),
+    (re.compile(r'class\s+(\w+)\s*{'), 'class'),
+    (re.compile(r'(\w+)\s*:\s*function\s*\((.*?)\)\s*{'), 'method'),
+    (re.compile(r'(\w+)\s*:\s*\((.*?)\)\s*=>\s*{'), 'method'),
+    (re.compile(r'(\w+)\s*=\s*\((.*?)\)\s*=>\s*{'), 'method'),
+    (re.compile(r'(\w+)\s*=\s*async\s*\((.*?)\)\s*=>\s*{'), 'method'),
+    (re.compile(r'(\w+)\s*=\s*async\s*function\s*\((.*?)\)\s*{'), 'method')
+]
+# Method patterns per file type, resolved once instead of branching in every _extract_methods call
+_METHOD_PATTERNS = {
+    'python': _PY_METHOD_PATTERNS,
+    'javascript': _JS_METHOD_PATTERNS,
+    'typescript': _JS_METHOD_PATTERNS
+}
+
+# Delimiters of the leading doc comment in a method body, per file type
+_DOCSTRING_DELIMITERS = {
+    'python': ('"""', '"""'),
+    'javascript': ('/**', '*/'),
+    'typescript': ('/**', '*/')
+}
+
+def _fast_docstring(body: str, open_delim: str, close_delim: str) -> str:
+    """Return the text between the first open_delim and the following close_delim, or '' if unterminated."""
+    start = body.find(open_delim)
+    if start < 0:
+        return ""
+    start += len(open_delim)
+    end = body.find(close_delim, start)
+    return body[start:end].strip() if end >= 0 else ""
+
+# Entry-point and core-file markers, each folded into one alternation so a file is searched once
+_ENTRY_POINT_RE = re.compile(r'if\s+__name__\s*==\s*[\'"]__main__[\'"]|main\s*\(\)|app\.run|index\.(?:html|js|ts)')
+_CORE_FILE_RE = re.compile(r'class\s+.*?(?:Manager|Service|Handler|Controller|Processor|Engine|Client|Server)')
+
+_DOC_PATTERNS = [
+    re.compile(r'"""(.*?)"""', re.MULTILINE),  # Python docstrings
+    re.compile(r'/\*\*(.*?)\*/', re.MULTILINE),  # JSDoc comments
+    re.compile(r'#\s*(.*?)$', re.MULTILINE)  # Single-line comments
+]
+_PARAMS_RE = re.compile(r'\((.*?)\)')
+_RETURN_RE = re.compile(r'return\s+(.+?)(?:\n|$)')
+_WORDS_RE = re.compile(r'\b\w+(?:\s+\w+)*\b')
+# Words of a camelCase/snake_case name; acronyms ("HTTPServer" -> "HTTP", "Server") and digit runs are kept whole
+_CAMEL_SNAKE_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+# One alternation over every declaration form; each match yields its name plus, when present,
+# its parameter list and whether it is called/defined like a function. Only the keyword is consumed
+# (the rest sits in a lookahead), so a declaration whose name spans another keyword does not hide it.
+_DECLARATION_RE = re.compile(
+    r'(?P<def>def(?=\s+(?P<def_name>\w+)(?P<def_call>(?=\s*\())?(?:\s*\((?P<def_params>.*?)\):)?))'  # Python functions
+    r'|(?P<class>class(?=\s+(?P<class_name>\w+)))'  # Classes
+    r'|(?P<function>function(?=\s+(?P<function_name>\w+)(?P<function_call>(?=\s*\())?(?:\s*\((?P<function_params>.*?)\)\s*{)?))'  # JavaScript functions
+    r'|(?P<const>const(?=\s+(?P<const_name>\w+)(?P<const_call>\s*=\s*function\s*\()?))'  # JavaScript constants
+)
+# Whole import lines per file type, leading indentation allowed
+_PY_IMPORT_RE = re.compile(r'^[^\S\n]*(?:import |from ).*$', re.MULTILINE)
+_JS_IMPORT_RE = re.compile(r'^[^\S\n]*(?:import |require\().*$', re.MULTILINE)
+_IMPORT_PATTERNS = {
+    'python': _PY_IMPORT_RE,
+    'javascript': _JS_IMPORT_RE,
+    'typescript': _JS_IMPORT_RE
+}
+_VAR_PATTERNS = [
+    re.compile(r'(\w+)\s*=\s*[\'"]([^\'"]+)[\'"]'),  # String assignments
+    re.compile(r'(\w+)\s*=\s*[\'"]?([^\'"]+)[\'"]?'),  # General assignments
+]
+
+_FEATURE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'feature[s]?\s*:?\s*([^.!?]+)',
+        r'functionality\s*:?\s*([^.!?]+)',
+        r'capability\s*:?\s*([^.!?]+)',
+        r'provides?\s*:?\s*([^.!?]+)',
+        r'handles?\s*:?\s*([^.!?]+)',
+        r'processes?\s*:?\s*([^.!?]+)',
+        r'manages?\s*:?\s*([^.!?]+)',
+        r'creates?\s*:?\s*([^.!?]+)',
+        r'generates?\s*:?\s*([^.!?]+)',
+        r'validates?\s*:?\s*([^.!?]+)',
+        r'uploads?\s*:?\s*([^.!?]+)',
+        r'downloads?\s*:?\s*([^.!?]+)',
+        r'stores?\s*:?\s*([^.!?]+)',
+        r'retrieves?\s*:?\s*([^.!?]+)',
+        r'queries?\s*:?\s*([^.!?]+)',
+        r'searches?\s*:?\s*([^.!?]+)',
+        r'filters?\s*:?\s*([^.!?]+)',
+        r'sorts?\s*:?\s*([^.!?]+)',
+        r'analyzes?\s*:?\s*([^.!?]+)',
+    )
+]
+_FILE_OP_PATTERNS = [
+    re.compile(r'open\s*\([\'"]([^\'"]+)[\'"]'),  # File operations
+    re.compile(r'\.upload\s*\('),  # Upload operations
+    re.compile(r'\.download\s*\('),  # Download operations
+    re.compile(r'\.save\s*\('),  # Save operations
+    re.compile(r'\.read\s*\('),  # Read operations
+    re.compile(r'\.write\s*\('),  # Write operations
+    re.compile(r'\.delete\s*\('),  # Delete operations
+    re.compile(r'\.create\s*\('),  # Create operations
+    re.compile(r'\.update\s*\('),  # Update operations
+]
+_ROUTE_PATTERNS = [
+    re.compile(r'@app\.route\s*\([\'"]([^\'"]+)[\'"]'),  # Flask routes
+    re.compile(r'router\.(get|post|put|delete)\s*\([\'"]([^\'"]+)[\'"]'),  # Express routes
+    re.compile(r'@(Get|Post|Put|Delete)\s*\([\'"]([^\'"]+)[\'"]'),  # NestJS routes
+]
+
+class _cached_slot:
+    """functools.cached_property for classes with __slots__: the value lives in the slot named '_' + the method name."""
+    def __init__(self, func):
+        self.func = func
+        self.slot = '_' + func.__name__
+        self.__doc__ = func.__doc__
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.func(instance)
+            setattr(instance, self.slot, value)
+            return value
+
 class CodeNode:
+    # One node per indexed file, so drop the per-instance __dict__
+    __slots__ = (
+        'file_path', 'content', 'file_type', 'methods', 'import_lines', 'imports', 'imported_by',
+        'references', 'referenced_by', 'embedding', 'method_embeddings', 'is_entry_point', 'is_core_file',
+        '_purpose', '_keywords', '_features', 'llm_client', 'detailed_summary', 'method_details',
+        '_method_summaries', '_summary', '_docs', '_declared_names', '_declared_params', '_function_names'
+    )
+    
     def __init__(self, file_path: str, content: str, llm_client=None):
         try:
             self.file_path = file_path
             self.content = content
             self.file_type = self._get_file_type()
             self.methods = self._extract_methods()
+            self.import_lines = self._extract_import_lines()
             self.imports = set()
             self.imported_by = set()
             self.references = set()
@@ -27,82 +214,67 @@ class CodeNode:
             self.method_embeddings = {}
             self.is_entry_point = self._is_entry_point()
             self.is_core_file = self._is_core_file()
-            self.purpose = self._extract_purpose()
-            self.keywords = self._extract_keywords()
-            self.features = self._extract_features()
+            self._scan_content()
             self.llm_client = llm_client
             self.detailed_summary = None
             self.method_details = {}
-            self.method_summaries = self._generate_method_summaries()
             
             # Generate detailed summaries if LLM client is available
             if self.llm_client:
                 self._generate_detailed_summaries()
             
-            # Generate the final summary after all other attributes are set
-            self.summary = self._generate_summary()
+            # purpose, keywords, features, method_summaries and summary are built on first access
             logger.info(f"CodeNode initialized successfully for {file_path}")
         except Exception as e:
             logger.error(f"Error initializing CodeNode for {file_path}: {str(e)}")
             raise
     
+    @_cached_slot
+    def purpose(self) -> str:
+        return self._extract_purpose()
+    
+    @_cached_slot
+    def keywords(self) -> List[str]:
+        return self._extract_keywords()
+    
+    @_cached_slot
+    def features(self) -> List[str]:
+        return self._extract_features()
+    
+    @_cached_slot
+    def method_summaries(self) -> Dict[str, str]:
+        return self._generate_method_summaries()
+    
+    @_cached_slot
+    def summary(self) -> str:
+        """Final summary; read after build_graph it also lists the file's relationships."""
+        return self._generate_summary()
+    
     def _get_file_type(self) -> str:
         ext = os.path.splitext(self.file_path)[1].lower()
-        file_types = {
-            'python': ['.py'],
-            'typescript': ['.ts', '.tsx'],
-            'javascript': ['.js', '.jsx'],
-            'html': ['.html'],
-            'css': ['.css'],
-            'json': ['.json'],
-            'markdown': ['.md']
-        }
-        for lang, extensions in file_types.items():
-            if ext in extensions:
-                return lang
-        return 'unknown'
+        return _FILE_TYPES.get(ext, _UNKNOWN_FILE_TYPE)
     
     def _extract_methods(self) -> List[Dict]:
         methods = []
         try:
-            if self.file_type == 'python':
-                patterns = [
-                    (r'def\s+(\w+)\s*\((.*?)\):', 'function'),
-                    (r'class\s+(\w+)\s*\((.*?)\):', 'class'),
-                    (r'class\s+(\w+):', 'class')
-                ]
-            elif self.file_type in ['typescript', 'javascript']:
-                patterns = [
-                    (r'function\s+(\w+)\s*\((.*?)\)\s*{', 'function'),
-                    (r'const\s+(\w+)\s*=\s*function\s*\((.*?)\)\s*{', 'function'),
-                    (r'class\s+(\w+)\s*{', 'class'),
-                    (r'(\w+)\s*:\s*function\s*\((.*?)\)\s*{', 'method'),
-                    (r'(\w+)\s*:\s*\((.*?)\)\s*=>\s*{', 'method'),
-                    (r'(\w+)\s*=\s*\((.*?)\)\s*=>\s*{', 'method'),
-                    (r'(\w+)\s*=\s*async\s*\((.*?)\)\s*=>\s*{', 'method'),
-                    (r'(\w+)\s*=\s*async\s*function\s*\((.*?)\)\s*{', 'method')
-                ]
-            else:
+            patterns = _METHOD_PATTERNS.get(self.file_type)
+            if patterns is None:
                 return methods
             
+            # Scan the str itself: byte patterns would match \w against ASCII only (dropping non-ASCII method
+            # names), and encoding or mapping the file would add a second copy of content already in memory
             for pattern, method_type in patterns:
-                matches = re.finditer(pattern, self.content)
-                for match in matches:
+                # A body runs until the next match of the same pattern, so collect them all in one scan
+                matches = list(pattern.finditer(self.content))
+                for i, match in enumerate(matches):
                     try:
                         name = match.group(1)
                         start_pos = match.end()
-                        next_match = re.search(pattern, self.content[start_pos:])
-                        end_pos = start_pos + next_match.start() if next_match else len(self.content)
+                        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(self.content)
                         body = self.content[start_pos:end_pos].strip()
                         
                         # Get documentation
-                        docstring = ""
-                        if self.file_type == 'python':
-                            doc_match = re.search(r'"""(.*?)"""', body, re.DOTALL)
-                        else:
-                            doc_match = re.search(r'/\*\*(.*?)\*/', body, re.DOTALL)
-                        if doc_match:
-                            docstring = doc_match.group(1).strip()
+                        docstring = _fast_docstring(body, *_DOCSTRING_DELIMITERS[self.file_type])
                         
                         methods.append({
                             'name': name,
@@ -120,50 +292,46 @@ class CodeNode:
             logger.error(f"Error in _extract_methods for {self.file_path}: {str(e)}")
             return methods
     
+    def _extract_import_lines(self) -> List[str]:
+        """Collect the file's import lines in one regex scan for build_graph's relationship pass."""
+        pattern = _IMPORT_PATTERNS.get(self.file_type)
+        return pattern.findall(self.content) if pattern else []
+    
     def _is_entry_point(self) -> bool:
         """Check if this file is an entry point of the application."""
-        entry_point_patterns = [
-            r'if\s+__name__\s*==\s*[\'"]__main__[\'"]',
-            r'main\s*\(\)',
-            r'app\.run',
-            r'index\.html',
-            r'index\.js',
-            r'index\.ts'
-        ]
-        return any(re.search(pattern, self.content) for pattern in entry_point_patterns)
+        return _ENTRY_POINT_RE.search(self.content) is not None
     
     def _is_core_file(self) -> bool:
         """Check if this file contains core functionality."""
-        core_patterns = [
-            r'class\s+.*?Manager',
-            r'class\s+.*?Service',
-            r'class\s+.*?Handler',
-            r'class\s+.*?Controller',
-            r'class\s+.*?Processor',
-            r'class\s+.*?Engine',
-            r'class\s+.*?Client',
-            r'class\s+.*?Server'
-        ]
-        return any(re.search(pattern, self.content) for pattern in core_patterns)
+        return _CORE_FILE_RE.search(self.content) is not None
+    
+    def _scan_content(self) -> None:
+        """Collect doc comments and declarations in one pass each, shared by the purpose, keyword and feature extractors."""
+        # Doc comments, grouped by pattern in the order the extractors expect
+        self._docs = [match.group(1).strip() for pattern in _DOC_PATTERNS for match in pattern.finditer(self.content)]
+        
+        # Declared names, their parameter lists, and names declared as functions
+        self._declared_names = []
+        self._declared_params = []
+        self._function_names = []
+        for match in _DECLARATION_RE.finditer(self.content):
+            kind = match.lastgroup
+            name = match.group(f'{kind}_name')
+            self._declared_names.append(name)
+            if kind != 'class':
+                if match.group(f'{kind}_call') is not None:
+                    self._function_names.append(name)
+                if kind != 'const' and match.group(f'{kind}_params') is not None:
+                    self._declared_params.append(match.group(f'{kind}_params'))
     
     def _extract_purpose(self) -> str:
         """Extract the purpose of this file from its content and documentation."""
-        # Look for purpose in docstrings
-        docstring_patterns = [
-            r'"""(.*?)"""',  # Python docstrings
-            r'/\*\*(.*?)\*/',  # JSDoc comments
-            r'#\s*(.*?)$'  # Single-line comments
-        ]
-        
         purpose = []
         
         # Check file-level documentation
-        for pattern in docstring_patterns:
-            matches = re.finditer(pattern, self.content, re.MULTILINE)
-            for match in matches:
-                doc = match.group(1).strip()
-                if len(doc) > 20:  # Only consider substantial documentation
-                    purpose.append(doc)
+        for doc in self._docs:
+            if len(doc) > 20:  # Only consider substantial documentation
+                purpose.append(doc)
         
         # Check method documentation for core functionality
         for method in self.methods:
@@ -193,14 +361,14 @@ class CodeNode:
             
             # Try to extract parameters and return type from the signature
             if method['type'] == 'function':
-                params_match = re.search(r'\((.*?)\)', method['body'])
+                params_match = _PARAMS_RE.search(method['body'])
                 if params_match:
                     params = params_match.group(1).strip()
                     if params:
                         summary.append(f"Parameters: {params}")
             
             # Look for return statements
-            returns = re.findall(r'return\s+(.+?)(?:\n|$)', method['body'])
+            returns = _RETURN_RE.findall(method['body'])
             if returns:
                 summary.append("Returns: " + ", ".join(returns))
             
@@ -214,13 +382,29 @@ class CodeNode:
             return
         
         try:
-            # Generate detailed file summary
+            # Reuse summaries stored in the client's cache for this exact model, path and content
+            cache = getattr(self.llm_client, 'cache', None)
+            cache_key = None
+            if cache is not None:
+                digest = hashlib.blake2b(digest_size=16)
+                digest.update(f"{getattr(self.llm_client, 'model', '')}|{self.file_path}|".encode())
+                digest.update(self.content.encode())
+                cache_key = f"node:{digest.hexdigest()}"
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    entry = json.loads(cached)
+                    self.detailed_summary = entry['detailed_summary']
+                    self.method_details = entry['method_details']
+                    logger.info(f"Loaded cached detailed summaries for {self.file_path}")
+                    return
+            
+            # Detailed file summary prompt
             file_prompt = f"""Please analyze this code file and provide a detailed explanation:
 
 File: {self.file_path}
 Type: {self.file_type}
 Content:
-{self.content}
+{_clip_for_prompt(self.content, PROMPT_MAX_CHARS)}
 
 Please provide:
 1. A comprehensive overview of what this file does
@@ -230,26 +414,18 @@ Please provide:
 5. Any notable patterns or design decisions
 
 Format your response in a clear, structured way."""
-
-            response = self.llm_client.generate(file_prompt, temperature=0.3)
-            if isinstance(response, dict) and "error" in response:
-                logger.error(f"Error generating file summary for {self.file_path}: {response['error']}")
-                self.detailed_summary = f"Error generating detailed summary: {response['error']}"
-            else:
-                # Handle both string and dict responses
-                self.detailed_summary = response if isinstance(response, str) else response.get("response", "")
             
-            # Generate detailed method summaries
+            # Detailed method summary prompts, keyed by method name (None is the file itself)
+            items = [(None, file_prompt)]
             for method in self.methods:
-                try:
-                    method_prompt = f"""Please analyze this method and provide a detailed explanation:
+                method_prompt = f"""Please analyze this method and provide a detailed explanation:
 
 File: {self.file_path}
 Method: {method['name']}
 Type: {method['type']}
 Parameters: {method.get('parameters', '')}
 Content:
-{method['body']}
+{_clip_for_prompt(method['body'], METHOD_PROMPT_MAX_CHARS)}
 
 Please provide:
 1. A detailed explanation of what this method does
@@ -259,17 +435,50 @@ Please provide:
 5. Any important side effects or dependencies
 
 Format your response in a clear, structured way."""
-
-                    response = self.llm_client.generate(method_prompt, temperature=0.3)
-                    if isinstance(response, dict) and "error" in response:
-                        logger.error(f"Error generating method summary for {method['name']} in {self.file_path}: {response['error']}")
-                        self.method_details[method['name']] = f"Error generating detailed summary: {response['error']}"
-                    else:
-                        # Handle both string and dict responses
-                        self.method_details[method['name']] = response if isinstance(response, str) else response.get("response", "")
+                items.append((method['name'], method_prompt))
+            
+            def run(item):
+                key, prompt = item
+                try:
+                    with _llm_slots:
+                        return key, self.llm_client.generate(prompt, temperature=0.3, stream=False, semantic=False)
                 except Exception as e:
-                    logger.error(f"Error generating detailed summary for method {method['name']} in {self.file_path}: {str(e)}")
-                    self.method_details[method['name']] = f"Error generating detailed summary: {str(e)}"
+                    return key, {"error": str(e)}
+            
+            # The calls are network-bound, so issue them concurrently over the client's shared connection pool;
+            # _llm_slots caps the total in flight across every file being built
+            with ThreadPoolExecutor(max_workers=min(LLM_MAX_CONCURRENCY, len(items))) as executor:
+                results = list(executor.map(run, items))
+            
+            failed = False
+            for key, response in results:
+                if isinstance(response, dict) and "error" in response:
+                    failed = True
+                    if key is None:
+                        logger.error(f"Error generating file summary for {self.file_path}: {response['error']}")
+                        self.detailed_summary = f"Error generating detailed summary: {response['error']}"
+                    else:
+                        logger.error(f"Error generating method summary for {key} in {self.file_path}: {response['error']}")
+                        self.method_details[key] = f"Error generating detailed summary: {response['error']}"
+                    continue
+                
+                # Handle both string and dict responses
+                text = response if isinstance(response, str) else response.get("response", "")
+                
+                # The client returns "" when a request fails (e.g. Ollama is down), so don't cache that
+                if not text:
+                    failed = True
+                if key is None:
+                    self.detailed_summary = text
+                else:
+                    self.method_details[key] = text
+            
+            # Only complete, error-free, non-empty results are worth keeping
+            if cache_key is not None and not failed:
+                cache.set(cache_key, json.dumps({
+                    'detailed_summary': self.detailed_summary,
+                    'method_details': self.method_details
+                }), ttl=SUMMARY_CACHE_TTL)
             
             logger.info(f"Generated detailed summaries for {self.file_path}")
         except Exception as e:
@@ -294,41 +503,35 @@ Format your response in a clear, structured way."""
             summary_parts.append("\nDetailed Analysis:")
             summary_parts.append(self.detailed_summary)
         
-        # Method overview with detailed summaries
+        # Method overview with detailed summaries; every line goes straight into summary_parts so there is one join
         if self.methods:
             summary_parts.append("\nKey Components:")
             for method in self.methods:
-                method_summary = []
-                method_summary.append(f"- {method['type'].title()} {method['name']}")
+                summary_parts.append(f"- {method['type'].title()} {method['name']}")
                 
                 # Add method parameters if available
                 if 'parameters' in method:
-                    method_summary.append(f"  Parameters: {method['parameters']}")
+                    summary_parts.append(f"  Parameters: {method['parameters']}")
                 
                 # Add docstring if available
                 if method['docstring']:
-                    method_summary.append(f"  Purpose: {method['docstring']}")
+                    summary_parts.append(f"  Purpose: {method['docstring']}")
                 
                 # Add detailed method summary if available
                 if method['name'] in self.method_details:
-                    method_summary.append(f"  Detailed Analysis: {self.method_details[method['name']]}")
-                
-                summary_parts.append("\n".join(method_summary))
+                    summary_parts.append(f"  Detailed Analysis: {self.method_details[method['name']]}")
         
         # Dependencies and relationships
-        relationships = []
-        if self.imports:
-            relationships.append(f"Imports: {', '.join(self.imports)}")
-        if self.imported_by:
-            relationships.append(f"Used by: {', '.join(self.imported_by)}")
-        if self.references:
-            relationships.append(f"References: {', '.join(self.references)}")
-        if self.referenced_by:
-            relationships.append(f"Referenced by: {', '.join(self.referenced_by)}")
-        
-        if relationships:
+        if self.imports or self.imported_by or self.references or self.referenced_by:
             summary_parts.append("\nRelationships:")
-            summary_parts.extend(relationships)
+            if self.imports:
+                summary_parts.append(f"Imports: {', '.join(self.imports)}")
+            if self.imported_by:
+                summary_parts.append(f"Used by: {', '.join(self.imported_by)}")
+            if self.references:
+                summary_parts.append(f"References: {', '.join(self.references)}")
+            if self.referenced_by:
+                summary_parts.append(f"Referenced by: {', '.join(self.referenced_by)}")
         
         return "\n".join(summary_parts)
     
@@ -337,44 +540,18 @@ Format your response in a clear, structured way."""
         keywords = set()
         
         # Extract from docstrings and comments
-        doc_patterns = [
-            r'"""(.*?)"""',  # Python docstrings
-            r'/\*\*(.*?)\*/',  # JSDoc comments
-            r'#\s*(.*?)$'  # Single-line comments
-        ]
-        
-        for pattern in doc_patterns:
-            matches = re.finditer(pattern, self.content, re.MULTILINE)
-            for match in matches:
-                doc = match.group(1).strip()
-                # Extract words that look like features or functionality
-                words = re.findall(r'\b\w+(?:\s+\w+)*\b', doc)
-                keywords.update(words)
-        
-        # Extract from function and class names
-        name_patterns = [
-            r'def\s+(\w+)',  # Python functions
-            r'class\s+(\w+)',  # Classes
-            r'function\s+(\w+)',  # JavaScript functions
-            r'const\s+(\w+)',  # JavaScript constants
-        ]
-        
-        for pattern in name_patterns:
-            matches = re.finditer(pattern, self.content)
-            for match in matches:
-                name = match.group(1)
-                # Split camelCase and snake_case
-                words = re.findall(r'[A-Z][a-z]+|[a-z]+', name)
-                keywords.update(words)
+        for doc in self._docs:
+            # Extract words that look like features or functionality
+            words = _WORDS_RE.findall(doc)
+            keywords.update(words)
         
-        # Extract from variable names and assignments
-        var_patterns = [
-            r'(\w+)\s*=\s*[\'"]([^\'"]+)[\'"]',  # String assignments
-            r'(\w+)\s*=\s*[\'"]?([^\'"]+)[\'"]?',  # General assignments
-        ]
+        # Extract from function and class names, splitting camelCase and snake_case in one scan
+        # (no match crosses the separating spaces, so this equals splitting each name)
+        keywords.update(_CAMEL_SNAKE_RE.findall(' '.join(self._declared_names)))
         
-        for pattern in var_patterns:
-            matches = re.finditer(pattern, self.content)
+        # Extract from variable names and assignments
+        for pattern in _VAR_PATTERNS:
+            matches = pattern.finditer(self.content)
             for match in matches:
                 var_name = match.group(1)
                 value = match.group(2)
@@ -384,19 +561,12 @@ Format your response in a clear, structured way."""
                     keywords.add(value)
         
         # Extract from function parameters
-        param_patterns = [
-            r'def\s+\w+\s*\((.*?)\):',  # Python function parameters
-            r'function\s+\w+\s*\((.*?)\)\s*{',  # JavaScript function parameters
-        ]
-        
-        for pattern in param_patterns:
-            matches = re.finditer(pattern, self.content)
-            for match in matches:
-                params = match.group(1).strip()
-                if params:
-                    # Split parameters and extract names
-                    param_names = [p.strip().split(':')[0].strip() for p in params.split(',')]
-                    keywords.update(param_names)
+        for params in self._declared_params:
+            params = params.strip()
+            if params:
+                # Split parameters and extract names
+                param_names = [p.strip().split(':')[0].strip() for p in params.split(',')]
+                keywords.update(param_names)
         
         return list(keywords)
     
@@ -405,85 +575,35 @@ Format your response in a clear, structured way."""
         features = set()
         
         # Look for feature indicators in docstrings and comments
-        feature_patterns = [
-            r'feature[s]?\s*:?\s*([^.!?]+)',
-            r'functionality\s*:?\s*([^.!?]+)',
-            r'capability\s*:?\s*([^.!?]+)',
-            r'provides?\s*:?\s*([^.!?]+)',
-            r'handles?\s*:?\s*([^.!?]+)',
-            r'processes?\s*:?\s*([^.!?]+)',
-            r'manages?\s*:?\s*([^.!?]+)',
-            r'creates?\s*:?\s*([^.!?]+)',
-            r'generates?\s*:?\s*([^.!?]+)',
-            r'validates?\s*:?\s*([^.!?]+)',
-            r'uploads?\s*:?\s*([^.!?]+)',
-            r'downloads?\s*:?\s*([^.!?]+)',
-            r'stores?\s*:?\s*([^.!?]+)',
-            r'retrieves?\s*:?\s*([^.!?]+)',
-            r'queries?\s*:?\s*([^.!?]+)',
-            r'searches?\s*:?\s*([^.!?]+)',
-            r'filters?\s*:?\s*([^.!?]+)',
-            r'sorts?\s*:?\s*([^.!?]+)',
-            r'analyzes?\s*:?\s*([^.!?]+)',
-            r'processes?\s*:?\s*([^.!?]+)',
-        ]
-        
-        for pattern in feature_patterns:
-            matches = re.finditer(pattern, self.content, re.IGNORECASE)
+        for pattern in _FEATURE_PATTERNS:
+            matches = pattern.finditer(self.content)
             for match in matches:
                 feature = match.group(1).strip()
                 if len(feature) > 5:  # Only include substantial features
                     features.add(feature)
         
         # Look for feature indicators in function names
-        function_patterns = [
-            r'def\s+(\w+)\s*\(',  # Python functions
-            r'function\s+(\w+)\s*\(',  # JavaScript functions
-            r'const\s+(\w+)\s*=\s*function\s*\(',  # JavaScript arrow functions
-        ]
-        
-        for pattern in function_patterns:
-            matches = re.finditer(pattern, self.content)
-            for match in matches:
-                name = match.group(1)
-                # Convert camelCase and snake_case to readable features
-                words = re.findall(r'[A-Z][a-z]+|[a-z]+', name)
-                if len(words) > 1:  # Only include multi-word features
-                    features.add(' '.join(words))
+        for name in self._function_names:
+            # Convert camelCase and snake_case to readable features
+            words = _CAMEL_SNAKE_RE.findall(name)
+            if len(words) > 1:  # Only include multi-word features
+                features.add(' '.join(words))
         
         # Look for file operations and API endpoints
-        file_patterns = [
-            r'open\s*\([\'"]([^\'"]+)[\'"]',  # File operations
-            r'\.upload\s*\(',  # Upload operations
-            r'\.download\s*\(',  # Download operations
-            r'\.save\s*\(',  # Save operations
-            r'\.read\s*\(',  # Read operations
-            r'\.write\s*\(',  # Write operations
-            r'\.delete\s*\(',  # Delete operations
-            r'\.create\s*\(',  # Create operations
-            r'\.update\s*\(',  # Update operations
-        ]
-        
-        for pattern in file_patterns:
-            matches = re.finditer(pattern, self.content)
+        for pattern in _FILE_OP_PATTERNS:
+            matches = pattern.finditer(self.content)
             for match in matches:
                 if len(match.groups()) > 0:
                     feature = match.group(1)
                     if len(feature) > 5:
                         features.add(f"handles {feature}")
                 else:
-                    feature = pattern.replace(r'\\', '').replace(r'\(', '').replace(r'\)', '')
+                    feature = pattern.pattern.replace(r'\\', '').replace(r'\(', '').replace(r'\)', '')
                     features.add(f"performs {feature}")
         
         # Look for API endpoints and routes
-        route_patterns = [
-            r'@app\.route\s*\([\'"]([^\'"]+)[\'"]',  # Flask routes
-            r'router\.(get|post|put|delete)\s*\([\'"]([^\'"]+)[\'"]',  # Express routes
-            r'@(Get|Post|Put|Delete)\s*\([\'"]([^\'"]+)[\'"]',  # NestJS routes
-        ]
-        
-        for pattern in route_patterns:
-            matches = re.finditer(pattern, self.content)
+        for pattern in _ROUTE_PATTERNS:
+            matches = pattern.finditer(self.content)
             for match in matches:
                 if len(match.groups()) > 1:
                     method = match.group(1)
@@ -495,12 +615,64 @@ Format your response in a clear, structured way."""
         
         return list(features)
 
+# Leading characters checked for a NUL byte when deciding whether a file is binary, as git does
+BINARY_SNIFF_CHARS = 4096
+
+# Below this many files the first build_graph pass runs serially; pool startup would cost more than it saves
+PARALLEL_BUILD_MIN_FILES = 32
+
+def _build_node(file_path: str, content: str, llm_client=None) -> Optional[CodeNode]:
+    """Build one CodeNode in a worker, returning None if it fails (the node logs the error)."""
+    try:
+        return CodeNode(file_path, content, llm_client)
+    except Exception:
+        return None
+
+def _path_components(file_path: str) -> Set[str]:
+    """Directory names and the extension-less file name of a path, the units an import can name."""
+    parts = re.split(r'[\\/]', file_path)
+    parts[-1] = os.path.splitext(parts[-1])[0]
+    return {part for part in parts if part}
+
+# find_relevant_files weights for the summary, best method, best feature, best keyword and purpose similarities
+SCORE_WEIGHTS = np.array([0.3, 0.2, 0.2, 0.15, 0.15], dtype=np.float32)
+
+def _text_key(text: str) -> bytes:
+    """Digest identifying a text in the embedding cache."""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+def _segment_max(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Max of each values[offsets[i]:offsets[i + 1]] in one reduceat call, 0 for empty segments."""
+    result = np.zeros(len(offsets) - 1, dtype=np.float32)
+    starts = offsets[:-1]
+    non_empty = offsets[1:] > starts
+    if non_empty.any():
+        # Segments are contiguous, so each non-empty one runs exactly up to the next non-empty start
+        block = values[offsets[0]:offsets[-1]]
+        result[non_empty] = np.maximum.reduceat(block, starts[non_empty] - offsets[0])
+    return result
+
 class SearchEngine:
-    def __init__(self, llm_client=None):
+    def __init__(self, llm_client=None, quantize: Optional[str] = None, embedding_cache_path: Optional[str] = None):
         try:
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            if quantize not in (None, 'fp16', 'int8'):
+                raise ValueError(f"Unsupported quantize mode: {quantize}")
+            self.model = load_embedding_model('all-MiniLM-L6-v2')
+            self.quantize = quantize  # None (float32), 'fp16', or 'int8' with a per-vector scale
             self.graph = {}  # file_path -> CodeNode
-            self.embeddings = {}  # file_path -> embedding
+            self.embeddings = {}  # file_path -> embedding, or (int8 embedding, scale) when quantize='int8'
+            self._paths = []  # row order of _emb_matrix
+            self._emb_matrix = None  # (files, dim) L2-normalized rows in the quantize dtype
+            self._emb_scales = None  # per-row scales of an int8 _emb_matrix
+            self._index = None  # faiss inner-product index over _emb_matrix when it is float32
+            self._neighbors = {}  # file_path -> frozenset of every file it imports, references or is used by
+            self.embedding_cache_path = embedding_cache_path  # .npz file persisting _text_embeddings, if set
+            self._text_embeddings = {}  # blake2b digest of a text -> its L2-normalized float32 embedding, kept to carry over between unquantized builds
+            self._score_paths = []  # files in the order of _score_bounds' segments
+            self._score_matrix = None  # embeddings of every text find_relevant_files scores in the quantize dtype, built once per build_graph
+            self._score_scales = None  # per-row scales of an int8 _score_matrix
+            self._score_bounds = None  # bounds of each (component, file) segment of _score_matrix's rows
+            self._load_embedding_cache()
             self.codebase_purpose = None
             self.codebase_summary = None
             self.llm_client = llm_client
@@ -517,30 +689,51 @@ class SearchEngine:
             failed_files = 0
             
             logger.info(f"Starting to build graph for {total_files} files")
+            self._score_matrix = None
             
             # First pass: Create nodes with detailed summaries
+            paths = []
+            contents = []
             for file_path, content in files_content.items():
-                try:
-                    # Skip empty files
-                    if not content or not content.strip():
-                        logger.warning(f"Skipping empty file: {file_path}")
-                        failed_files += 1
-                        continue
-                        
-                    # Skip binary files
-                    if '\0' in content:
-                        logger.warning(f"Skipping binary file: {file_path}")
+                # Skip empty files
+                if not content or content.isspace():
+                    logger.warning(f"Skipping empty file: {file_path}")
+                    failed_files += 1
+                    continue
+                    
+                # Skip binary files
+                if '\0' in content[:BINARY_SNIFF_CHARS]:
+                    logger.warning(f"Skipping binary file: {file_path}")
+                    failed_files += 1
+                    continue
+                
+                paths.append(file_path)
+                contents.append(content)
+            
+            # Regex-only nodes are CPU-bound and go to worker processes; nodes that call the LLM
+            # (whose client may not pickle) wait on I/O and go to threads instead
+            if len(paths) < PARALLEL_BUILD_MIN_FILES or (self.llm_client is None and (os.cpu_count() or 1) < 2):
+                nodes = map(_build_node, paths, contents, [self.llm_client] * len(paths))
+                executor = None
+            elif self.llm_client is None:
+                executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+                nodes = executor.map(_build_node, paths, contents, chunksize=32)
+            else:
+                executor = ThreadPoolExecutor(max_workers=8)
+                nodes = executor.map(_build_node, paths, contents, [self.llm_client] * len(paths))
+            
+            try:
+                for file_path, node in zip(paths, nodes):
+                    if node is None:
                         failed_files += 1
                         continue
-                    
-                    self.graph[file_path] = CodeNode(file_path, content, self.llm_client)
+                    self.graph[file_path] = node
                     processed_files += 1
                     progress = (processed_files / total_files) * 100
                     logger.info(f"Progress: {progress:.1f}% - Created node for {file_path}")
-                except Exception as e:
-                    logger.error(f"Error creating node for {file_path}: {str(e)}")
-                    failed_files += 1
-                    continue
+            finally:
+                if executor is not None:
+                    executor.shutdown()
             
             if not self.graph:
                 logger.error("No valid files were processed to create the graph")
@@ -553,33 +746,34 @@ class SearchEngine:
             failed_files = 0
             total_files = len(self.graph)
             
+            # Index paths by component so each import resolves with one lookup instead of a scan over every path
+            paths_by_component = defaultdict(list)
+            for other_path in self.graph:
+                for component in _path_components(other_path):
+                    paths_by_component[component].append(other_path)
+            
             for file_path, node in self.graph.items():
                 try:
                     # Extract imports and references
                     if node.file_type == 'python':
-                        import_lines = [line for line in node.content.split('\n') 
-                                      if line.strip().startswith(('import ', 'from '))]
-                        for line in import_lines:
+                        for line in node.import_lines:
                             try:
                                 module = line.split()[1].split('.')[0]
-                                for other_path in self.graph:
-                                    if module in other_path:
-                                        node.imports.add(other_path)
-                                        self.graph[other_path].imported_by.add(file_path)
+                                for other_path in paths_by_component.get(module, ()):
+                                    node.imports.add(other_path)
+                                    self.graph[other_path].imported_by.add(file_path)
                             except Exception as e:
                                 logger.error(f"Error processing import line '{line}' in {file_path}: {str(e)}")
                                 continue
                     
                     elif node.file_type in ['typescript', 'javascript']:
-                        import_lines = [line for line in node.content.split('\n') 
-                                      if line.strip().startswith(('import ', 'require('))]
-                        for line in import_lines:
+                        for line in node.import_lines:
                             try:
                                 module = line.split()[1].strip("'\"")
-                                for other_path in self.graph:
-                                    if module in other_path:
-                                        node.imports.add(other_path)
-                                        self.graph[other_path].imported_by.add(file_path)
+                                module = os.path.splitext(os.path.basename(module))[0]
+                                for other_path in paths_by_component.get(module, ()):
+                                    node.imports.add(other_path)
+                                    self.graph[other_path].imported_by.add(file_path)
                             except Exception as e:
                                 logger.error(f"Error processing import line '{line}' in {file_path}: {str(e)}")
                                 continue
@@ -594,39 +788,69 @@ class SearchEngine:
             
             logger.info(f"Completed second pass: {processed_files} files processed, {failed_files} files failed")
             
-            # Compute embeddings using detailed summaries
-            processed_files = 0
-            failed_files = 0
+            # Freeze each file's relationships into one set so query-time expansion is a single union
+            self._neighbors = {
+                file_path: frozenset().union(node.imported_by, node.imports, node.referenced_by, node.references)
+                for file_path, node in self.graph.items()
+            }
+            
+            # Compute embeddings using detailed summaries: collect every text first, then encode them in batches
+            file_paths = []
+            file_texts = []
+            method_keys = []
+            method_texts = []
             
             for file_path, node in self.graph.items():
-                try:
-                    # Compute file-level embedding using detailed summary
-                    summary_text = node.detailed_summary if node.detailed_summary else node.summary
-                    if not summary_text or not summary_text.strip():
-                        logger.warning(f"No valid summary text for {file_path}, using file content")
-                        summary_text = node.content
-                    
-                    self.embeddings[file_path] = self.model.encode(summary_text)
-                    
-                    # Compute method-level embeddings using detailed summaries
-                    for method in node.methods:
-                        try:
-                            method_context = node.method_details.get(method['name'], '') or node.method_summaries.get(method['name'], '')
-                            if method_context and method_context.strip():
-                                node.method_embeddings[method['name']] = self.model.encode(method_context)
-                        except Exception as e:
-                            logger.error(f"Error computing embedding for method {method['name']} in {file_path}: {str(e)}")
-                            continue
-                    
-                    processed_files += 1
-                    progress = (processed_files / total_files) * 100
-                    logger.info(f"Progress: {progress:.1f}% - Computed embeddings for {file_path}")
-                except Exception as e:
-                    logger.error(f"Error computing embeddings for {file_path}: {str(e)}")
-                    failed_files += 1
-                    continue
+                # File-level text using detailed summary
+                summary_text = node.detailed_summary if node.detailed_summary else node.summary
+                if not summary_text or not summary_text.strip():
+                    logger.warning(f"No valid summary text for {file_path}, using file content")
+                    summary_text = node.content
+                file_paths.append(file_path)
+                file_texts.append(summary_text)
+                
+                # Method-level texts using detailed summaries
+                for method in node.methods:
+                    method_context = node.method_details.get(method['name'], '') or node.method_summaries.get(method['name'], '')
+                    if method_context and method_context.strip():
+                        method_keys.append((file_path, method['name']))
+                        method_texts.append(method_context)
             
-            logger.info(f"Completed third pass: {processed_files} files processed, {failed_files} files failed")
+            try:
+                # Start a fresh cache each build, carrying over embeddings of texts that are still present;
+                # quantized engines drop the float32 cache between builds, so reload it from disk
+                if self.quantize and not self._text_embeddings:
+                    self._load_embedding_cache()
+                previous_embeddings, self._text_embeddings = self._text_embeddings, {}
+                file_vecs = self._embed_texts(file_texts, reuse=previous_embeddings)
+                
+                # Keep the stacked file embeddings so a query is scored against every file with one matmul
+                self._paths = file_paths
+                self._emb_matrix, self._emb_scales = self._quantize_rows(file_vecs)
+                if self.quantize is None:
+                    self._index = faiss.IndexFlatIP(self._emb_matrix.shape[1])
+                    self._index.add(self._emb_matrix)
+                else:
+                    self._index = None
+                for file_path, vec in zip(file_paths, self._unstack(self._emb_matrix, self._emb_scales)):
+                    self.embeddings[file_path] = vec
+                
+                if method_texts:
+                    method_vecs = self._embed_texts(method_texts, reuse=previous_embeddings)
+                    for (file_path, name), vec in zip(method_keys, self._unstack(*self._quantize_rows(method_vecs))):
+                        self.graph[file_path].method_embeddings[name] = vec
+                
+                # Embed and stack the remaining texts find_relevant_files scores so a query only has to encode itself
+                self._build_scoring(reuse=previous_embeddings)
+                self._save_embedding_cache()
+                
+                # Quantized engines score from the quantized matrices only, so don't hold float32 copies
+                if self.quantize:
+                    self._text_embeddings = {}
+                
+                logger.info(f"Completed third pass: embedded {len(file_texts)} files and {len(method_texts)} methods")
+            except Exception as e:
+                logger.error(f"Error computing embeddings: {str(e)}")
             
             # Analyze codebase
             self._analyze_codebase()
@@ -647,11 +871,9 @@ class SearchEngine:
         summary_parts.append(f"Total Files: {len(self.graph)}")
         
         # File types
-        file_types = {}
-        for node in self.graph.values():
-            file_types[node.file_type] = file_types.get(node.file_type, 0) + 1
+        file_types = Counter(node.file_type for node in self.graph.values())
         summary_parts.append("\nFile Types:")
-        for ftype, count in file_types.items():
+        for ftype, count in file_types.most_common():
             summary_parts.append(f"- {ftype}: {count} files")
         
         # Entry points
@@ -690,74 +912,180 @@ class SearchEngine:
             "core_files": [node.file_path for node in self.graph.values() if node.is_core_file]
         }
     
-    def find_relevant_files(self, query: str, max_files: int = 5) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
-        """Find relevant files and return their enriched content."""
-        if not self.graph:
-            return [], {}
+    def _quantize_rows(self, vecs: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Convert a float32 embedding matrix to the configured storage dtype, returning per-row scales for int8."""
+        if self.quantize == 'fp16':
+            return np.ascontiguousarray(vecs, dtype=np.float16), None
+        if self.quantize == 'int8':
+            scales = np.abs(vecs).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            quantized = np.round(vecs / scales[:, None]).astype(np.int8)
+            return np.ascontiguousarray(quantized), scales.astype(np.float32)
+        return np.ascontiguousarray(vecs, dtype=np.float32), None
+    
+    @staticmethod
+    def _unstack(matrix: np.ndarray, scales: Optional[np.ndarray]) -> List[Any]:
+        """Split a stored matrix into per-row embeddings, pairing int8 rows with their scale."""
+        if scales is None:
+            return list(matrix)
+        return list(zip(matrix, scales))
+    
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Rank files by cosine similarity of their summary embedding to the query."""
+        if self._emb_matrix is None:
+            return []
         
-        query_embedding = self.model.encode(query)
+        query_embedding = encode_query(self.model, query)
         
-        # Calculate initial relevance scores
-        file_scores = {}
-        for file_path, node in self.graph.items():
-            # File-level similarity using detailed summary
-            summary_text = node.detailed_summary if node.detailed_summary else node.summary
-            file_similarity = cosine_similarity([query_embedding], [self.model.encode(summary_text)])[0][0]
+        # Full-precision rows are searched by faiss; inner product of normalized vectors is cosine similarity
+        if self._index is not None:
+            scores, ids = self._index.search(query_embedding.reshape(1, -1), min(k, self._index.ntotal))
+            return [(self._paths[i], float(score)) for score, i in zip(scores[0], ids[0]) if i >= 0]
+        
+        scores = self._score_rows(self._emb_matrix, self._emb_scales, query_embedding)
+        top = np.argsort(-scores)[:k]
+        return [(self._paths[i], float(scores[i])) for i in top]
+    
+    @staticmethod
+    def _score_rows(matrix: np.ndarray, scales: Optional[np.ndarray], query_embedding: np.ndarray) -> np.ndarray:
+        """Inner product of every stored row with the query, rescaling int8 rows by their scale."""
+        if matrix.dtype == np.float32:
+            return matrix @ query_embedding
+        
+        # Quantized rows are widened for the BLAS matmul a block at a time, so no full float32 copy is held
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query_embedding
+        if scales is not None:
+            scores *= scales
+        return scores
+    
+    def _collect_scoring_texts(self) -> Tuple[List[str], List[str], np.ndarray]:
+        """Paths, texts scored by find_relevant_files component by component (summary, methods, features, keywords, purpose), and the bounds of each (component, file) segment."""
+        paths = list(self.graph)
+        components = [[], [], [], [], []]
+        for node in self.graph.values():
+            # File-level text using detailed summary
+            components[0].append([node.detailed_summary if node.detailed_summary else node.summary])
             
-            # Method-level similarity using detailed summaries
-            method_similarities = []
+            # Method-level texts using detailed summaries
+            method_texts = []
             for method in node.methods:
                 method_context = node.method_details.get(method['name'], '') or node.method_summaries.get(method['name'], '')
                 if method_context:
-                    method_similarity = cosine_similarity([query_embedding], [self.model.encode(method_context)])[0][0]
-                    method_similarities.append(method_similarity)
-            
-            # Feature-based relevance
-            feature_similarity = 0
-            if node.features:
-                feature_embeddings = [self.model.encode(feature) for feature in node.features]
-                feature_similarities = [cosine_similarity([query_embedding], [fe])[0][0] for fe in feature_embeddings]
-                feature_similarity = max(feature_similarities) if feature_similarities else 0
-            
-            # Keyword-based relevance
-            keyword_similarity = 0
-            if node.keywords:
-                keyword_embeddings = [self.model.encode(keyword) for keyword in node.keywords]
-                keyword_similarities = [cosine_similarity([query_embedding], [ke])[0][0] for ke in keyword_embeddings]
-                keyword_similarity = max(keyword_similarities) if keyword_similarities else 0
-            
-            # Purpose-based relevance
-            purpose_similarity = 0
-            if node.purpose and node.purpose != "Purpose not explicitly documented.":
-                purpose_embedding = self.model.encode(node.purpose)
-                purpose_similarity = cosine_similarity([query_embedding], [purpose_embedding])[0][0]
-            
-            # Combine scores with weights
-            max_method_similarity = max(method_similarities) if method_similarities else 0
-            file_scores[file_path] = (
-                0.3 * file_similarity +
-                0.2 * max_method_similarity +
-                0.2 * feature_similarity +
-                0.15 * keyword_similarity +
-                0.15 * purpose_similarity
-            )
-        
-        # Get initial set of relevant files
-        initial_files = sorted(file_scores.items(), key=lambda x: x[1], reverse=True)[:max_files]
-        relevant_files = [file_path for file_path, _ in initial_files]
-        
-        # Expand relevant files based on relationships
-        expanded_files = set(relevant_files)
-        for file_path in relevant_files:
-            node = self.graph[file_path]
-            # Add files that import this file
-            expanded_files.update(node.imported_by)
-            # Add files that this file imports
-            expanded_files.update(node.imports)
-            # Add files that reference this file
-            expanded_files.update(node.referenced_by)
-            # Add files that this file references
-            expanded_files.update(node.references)
+                    method_texts.append(method_context)
+            components[1].append(method_texts)
+            
+            # Feature, keyword and purpose texts
+            components[2].append(node.features)
+            components[3].append(node.keywords)
+            has_purpose = node.purpose and node.purpose != "Purpose not explicitly documented."
+            components[4].append([node.purpose] if has_purpose else [])
+        
+        texts = []
+        bounds = [0]
+        for per_file in components:
+            for file_texts in per_file:
+                texts.extend(file_texts)
+                bounds.append(len(texts))
+        
+        return paths, texts, np.array(bounds)
+    
+    def _build_scoring(self, reuse: Optional[Dict[bytes, np.ndarray]] = None, expect_cached: bool = False) -> None:
+        """Stack the embeddings of every scoring text into _score_matrix, with the paths and bounds of its segments."""
+        paths, texts, bounds = self._collect_scoring_texts()
+        matrix = self._embed_texts(texts, reuse=reuse, expect_cached=expect_cached)
+        self._score_paths = paths
+        self._score_bounds = bounds
+        self._score_matrix, self._score_scales = self._quantize_rows(matrix)
+        
+        # Point the text cache at the matrix rows so each vector is held once
+        if self.quantize is None:
+            self._text_embeddings.update(zip(map(_text_key, texts), self._score_matrix))
+    
+    def _embed_texts(self, texts: List[str], reuse: Optional[Dict[bytes, np.ndarray]] = None,
+                     expect_cached: bool = False) -> np.ndarray:
+        """Stack the normalized embeddings of texts, encoding only unseen ones; hits in reuse (an older cache) are moved over."""
+        keys = [_text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self._text_embeddings:
+                continue
+            if reuse and key in reuse:
+                self._text_embeddings[key] = reuse.pop(key)
+            else:
+                missing[key] = text
+        
+        # Callers on the query path expect a warm cache; a miss there means the build left texts unembedded
+        if missing and expect_cached:
+            message = f"Encoding {len(missing)} texts that should have been embedded when the graph was built"
+            if STRICT_EMBEDDING_CACHE:
+                raise AssertionError(message)
+            logger.warning(message)
+        
+        if missing:
+            vecs = self.model.encode(list(missing.values()), batch_size=64, convert_to_numpy=True,
+                                     show_progress_bar=False, normalize_embeddings=True)
+            self._text_embeddings.update(zip(missing.keys(), vecs.astype(np.float32)))
+        
+        return np.stack([self._text_embeddings[key] for key in keys])
+    
+    def _load_embedding_cache(self) -> None:
+        """Load text embeddings persisted by an earlier build with the same model configuration."""
+        if not self.embedding_cache_path or not os.path.exists(self.embedding_cache_path):
+            return
+        try:
+            with np.load(self.embedding_cache_path) as data:
+                # Vectors from another model, or the same one quantized differently, don't compare with fresh ones
+                signature = str(data['signature']) if 'signature' in data.files else None
+                if signature != self.model.embedding_signature:
+                    logger.info(f"Discarding embedding cache built with {signature or 'an unknown model'}")
+                    return
+                self._text_embeddings = {key.tobytes(): vec for key, vec in zip(data['keys'], data['vectors'])}
+            logger.info(f"Loaded {len(self._text_embeddings)} cached text embeddings")
+        except Exception as e:
+            logger.warning(f"Error loading embedding cache: {str(e)}, starting empty")
+            self._text_embeddings = {}
+    
+    def _save_embedding_cache(self) -> None:
+        """Persist the text embeddings so the next start does not re-encode unchanged texts."""
+        if not self.embedding_cache_path or not self._text_embeddings:
+            return
+        try:
+            np.savez(self.embedding_cache_path,
+                     signature=np.array(self.model.embedding_signature),
+                     keys=np.frombuffer(b''.join(self._text_embeddings.keys()), dtype=np.uint8).reshape(-1, 16),
+                     vectors=np.stack(list(self._text_embeddings.values())))
+        except Exception as e:
+            logger.error(f"Error saving embedding cache: {str(e)}")
+    
+    def find_relevant_files(self, query: str, max_files: int = 5) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """Find relevant files and return their enriched content."""
+        if not self.graph:
+            return [], {}
+        
+        # The scoring matrix is built with the graph; only if that failed does a query have to embed the corpus
+        if self._score_matrix is None:
+            self._build_scoring(expect_cached=True)
+        paths = self._score_paths
+        
+        query_embedding = encode_query(self.model, query)
+        
+        # Rows and query are unit length, so one BLAS matrix-vector product gives every cosine similarity
+        similarities = self._score_rows(self._score_matrix, self._score_scales, query_embedding)
+        
+        # Best match per file for each component in a single reduction over every (component, file) segment,
+        # weighted into scores with one product
+        components = _segment_max(similarities, self._score_bounds).reshape(len(SCORE_WEIGHTS), -1).T
+        file_scores = components @ SCORE_WEIGHTS
+        
+        # Get initial set of relevant files; a stable sort keeps graph order among equal scores
+        top = np.argsort(-file_scores, kind='stable')[:max_files]
+        relevant_files = [paths[i] for i in top]
+        
+        # Expand relevant files with everything they import, reference or are used by
+        expanded_files = set(relevant_files).union(*(self._neighbors.get(file_path, ()) for file_path in relevant_files))
         
         # Limit expanded set to top files
         expanded_files = list(expanded_files)[:max_files * 2]
@@ -1,18 +1,240 @@
 import numpy as np
 import faiss
+import atexit
+from array import array
 import json
+import orjson
 import os
+import weakref
 from typing import Dict, List, Optional, Tuple, Any
 import logging
+import torch
+from functools import lru_cache
 from sentence_transformers import SentenceTransformer
 
+# Set EMBEDDING_INT8=0 to keep the embedding model in float32
+EMBEDDING_INT8 = os.getenv("EMBEDDING_INT8", "1") != "0"
+
+# Set EMBEDDING_MAX_SEQ_LENGTH to truncate inputs to fewer tokens than the model's default (256 for MiniLM)
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "0")) or None
+
+_torch_threads_configured = False
+
+def _configure_torch_threads():
+    """Give matmuls all cores but one (left for the server) and run encode's ops one at a time; done once per process."""
+    global _torch_threads_configured
+    if _torch_threads_configured:
+        return
+    _torch_threads_configured = True
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) - 1))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before torch has started any inter-op work
+        pass
+
+def load_embedding_model(name: str = 'all-MiniLM-L6-v2') -> SentenceTransformer:
+    """Load a sentence embedding model, dynamically quantizing its Linear layers to int8 when it runs on CPU.
+    
+    The model's embedding_signature names everything that shapes its vectors, for checking persisted embeddings.
+    """
+    _configure_torch_threads()
+    model = SentenceTransformer(name)
+    if EMBEDDING_MAX_SEQ_LENGTH:
+        model.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    quantized = False
+    if EMBEDDING_INT8 and model.device.type == 'cpu':
+        try:
+            # Weights are stored as int8 and activations quantized on the fly, so matmuls use int8 GEMM kernels
+            transformer = model[0]
+            transformer.auto_model = torch.quantization.quantize_dynamic(
+                transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            quantized = True
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Error quantizing embedding model, using float32: {str(e)}")
+    
+    model.embedding_signature = f"{name}|int8={quantized}|max_seq_length={model.max_seq_length}"
+    
+    # Run one tiny batch so kernel selection and allocations happen at startup, not on the first request
+    model.encode(["warm up"], convert_to_numpy=True)
+    return model
+
+@lru_cache(maxsize=2048)
+def _encode_query_cached(model: SentenceTransformer, text: str) -> np.ndarray:
+    return model.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0].astype(np.float32)
+
+def encode_query(model: SentenceTransformer, text: str) -> np.ndarray:
+    """Normalized float32 embedding of a query, memoized so repeated queries skip the model."""
+    return _encode_query_cached(model, text).copy()
+
+# HNSW graph parameters: neighbors per node, and candidate list sizes while building and searching
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# IVFPQ parameters for large corpora: coarse cells, sub-quantizers of IVFPQ_NBITS bits each (~16x smaller than
+# float32), cells probed per query, and how many vectors are buffered before the index is trained
+IVFPQ_NLIST = 256
+IVFPQ_M = 48
+IVFPQ_NBITS = 8
+IVFPQ_NPROBE = 16
+IVFPQ_TRAIN_SIZE = 4 * IVFPQ_NLIST
+
+# Scalar quantizer code per index type: exhaustive search over half-precision (2x smaller than float32, no
+# training) or 8-bit (4x smaller, trained on the first IVFPQ_TRAIN_SIZE vectors) components
+SQ_TYPES = {"sq_fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+INDEX_TYPES = ("hnsw", "ivfpq") + tuple(SQ_TYPES)
+
+# Rows added between full saves of the index and metadata; rows added since the last save are logged to a JSONL file
+FLUSH_THRESHOLD = 64
+
+# Placeholder for a key a row does not have, distinct from an explicit None value
+_MISSING = object()
+
+# The same for the uint32 id and file path columns
+_NO_VALUE = 0xFFFFFFFF
+
+# Databases open in this process, flushed by one exit hook without keeping them alive
+_open_dbs = weakref.WeakSet()
+
+@atexit.register
+def _flush_open_dbs():
+    """Save the rows added since the last flush of every database still open at exit."""
+    for db in list(_open_dbs):
+        db.flush()
+
+class _MetadataColumns:
+    """Row metadata stored column by column (one list per key) instead of one dict per row."""
+    
+    def __init__(self):
+        self.columns = {}  # key -> one value per row, _MISSING where the row lacks the key
+        
+        # Every row has an id and a file path, so those are packed uint32 arrays, paths stored once each
+        self.ids = array('I')  # 'id' of each row
+        self.path_ids = array('I')  # 'file_path' of each row, as an index into paths
+        self.paths = []  # distinct file paths in first-seen order
+        self.path_interner: Dict[str, int] = {}  # file path -> its index in paths
+        self.num_rows = 0
+    
+    def __len__(self) -> int:
+        return self.num_rows
+    
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        """Materialize row i as a fresh dict."""
+        row = {}
+        if self.ids[i] != _NO_VALUE:
+            row['id'] = self.ids[i]
+        if self.path_ids[i] != _NO_VALUE:
+            row['file_path'] = self.paths[self.path_ids[i]]
+        for key, values in self.columns.items():
+            if values[i] is not _MISSING:
+                row[key] = values[i]
+        return row
+    
+    def __iter__(self):
+        for i in range(self.num_rows):
+            yield self[i]
+    
+    def file_path(self, i: int) -> Optional[str]:
+        """File path of row i without materializing the row."""
+        path_id = self.path_ids[i]
+        return None if path_id == _NO_VALUE else self.paths[path_id]
+    
+    def take(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Materialize several rows, gathering each column once."""
+        rows = [{} for _ in ids]
+        for row, row_id, path_id in zip(rows, [self.ids[i] for i in ids], [self.path_ids[i] for i in ids]):
+            if row_id != _NO_VALUE:
+                row['id'] = row_id
+            if path_id != _NO_VALUE:
+                row['file_path'] = self.paths[path_id]
+        for key, values in self.columns.items():
+            for row, value in zip(rows, [values[i] for i in ids]):
+                if value is not _MISSING:
+                    row[key] = value
+        return rows
+    
+    def _intern_path(self, file_path: str) -> int:
+        path_id = self.path_interner.get(file_path)
+        if path_id is None:
+            path_id = self.path_interner[file_path] = len(self.paths)
+            self.paths.append(file_path)
+        return path_id
+    
+    def append(self, row: Dict[str, Any]) -> None:
+        """Add a row, padding columns it does not have."""
+        self.ids.append(row.get('id', _NO_VALUE))
+        self.path_ids.append(self._intern_path(row['file_path']) if 'file_path' in row else _NO_VALUE)
+        for key, value in row.items():
+            if key == 'id' or key == 'file_path':
+                continue
+            values = self.columns.get(key)
+            if values is None:
+                values = self.columns[key] = [_MISSING] * self.num_rows
+            values.append(value)
+        self.num_rows += 1
+        for values in self.columns.values():
+            if len(values) < self.num_rows:
+                values.append(_MISSING)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form: each column as a plain list plus the rows missing from it."""
+        columns = {
+            'id': [None if v == _NO_VALUE else v for v in self.ids],
+            'file_path': [None if v == _NO_VALUE else self.paths[v] for v in self.path_ids]
+        }
+        missing = {
+            'id': [i for i, v in enumerate(self.ids) if v == _NO_VALUE],
+            'file_path': [i for i, v in enumerate(self.path_ids) if v == _NO_VALUE]
+        }
+        for key, values in self.columns.items():
+            columns[key] = [None if v is _MISSING else v for v in values]
+            missing[key] = [i for i, v in enumerate(values) if v is _MISSING]
+        return {'num_rows': self.num_rows, 'columns': columns, 'missing': missing}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_MetadataColumns":
+        store = cls()
+        store.num_rows = data['num_rows']
+        columns = dict(data['columns'])
+        ids = columns.pop('id', [None] * store.num_rows)
+        paths = columns.pop('file_path', [None] * store.num_rows)
+        missing_ids = set(data['missing'].get('id', ())) if 'id' in data['columns'] else range(store.num_rows)
+        missing_paths = set(data['missing'].get('file_path', ())) if 'file_path' in data['columns'] else range(store.num_rows)
+        store.ids = array('I', (_NO_VALUE if i in missing_ids else v for i, v in enumerate(ids)))
+        store.path_ids = array('I', (_NO_VALUE if i in missing_paths else store._intern_path(v) for i, v in enumerate(paths)))
+        for key, values in columns.items():
+            for i in data['missing'].get(key, ()):
+                values[i] = _MISSING
+            store.columns[key] = values
+        return store
+    
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "_MetadataColumns":
+        store = cls()
+        for row in rows:
+            store.append(row)
+        return store
+
 class VectorDB:
-    def __init__(self, db_path: str = "vector_index"):
+    def __init__(self, db_path: str = "vector_index", index_type: str = "hnsw"):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}")
         self.db_path = db_path
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')  # Fast and effective model for embeddings
+        self.index_type = index_type
+        self.model = load_embedding_model('all-MiniLM-L6-v2')  # Fast and effective model for embeddings
         self.dimension = 384  # Dimension of embeddings from the model
         self.index = None
-        self.metadata = []
+        self.metadata = _MetadataColumns()
+        self._pending_vectors = []  # vectors waiting for an untrained index (IVFPQ, sq8) to have enough to train on
+        self.file_index: Dict[str, int] = {}  # file path -> id of its file-level row
+        self._by_file: Dict[str, List[int]] = {}  # file path -> ids of all its rows
+        self._vectors_path = os.path.join(db_path, "embeddings.f32")  # every added vector, in row order
+        self._index_mapped = False  # index is a read-only memory map of index.faiss until the first add
+        self._pending_adds = 0  # rows added since the last flush
+        self._log_path = os.path.join(db_path, "metadata.pending.jsonl")
         
         # Initialize logger
         self.logger = logging.getLogger(__name__)
@@ -24,6 +246,7 @@ class VectorDB:
             self.logger.setLevel(logging.INFO)
         
         self._load_or_create_index()
+        _open_dbs.add(self)
     
     def _load_or_create_index(self):
         """Load existing index or create a new one."""
@@ -31,139 +254,343 @@ class VectorDB:
             # Create directory if it doesn't exist
             os.makedirs(self.db_path, exist_ok=True)
             
-            # Initialize metadata file if it doesn't exist or is corrupted
-            metadata_path = os.path.join(self.db_path, "metadata.json")
-            if not os.path.exists(metadata_path):
-                self._save_metadata()
-            else:
+            # Initialize metadata file if it doesn't exist or is corrupted; a row-per-dict metadata.json
+            # written by older versions is converted to the columnar file once
+            columns_path = os.path.join(self.db_path, "metadata.columns.json")
+            legacy_path = os.path.join(self.db_path, "metadata.json")
+            if os.path.exists(columns_path):
                 try:
-                    with open(metadata_path, 'r') as f:
-                        self.metadata = json.load(f)
+                    with open(columns_path, 'rb') as f:
+                        self.metadata = _MetadataColumns.from_dict(orjson.loads(f.read()))
+                except Exception as e:
+                    self.logger.warning(f"Error loading metadata: {str(e)}, reinitializing")
+                    self.metadata = _MetadataColumns()
+                    self._save_metadata()
+            elif os.path.exists(legacy_path):
+                try:
+                    with open(legacy_path, 'r') as f:
+                        rows = json.load(f)
                     # Validate metadata structure
-                    if not isinstance(self.metadata, list):
+                    if not isinstance(rows, list):
                         self.logger.warning("Invalid metadata structure, reinitializing")
-                        self.metadata = []
-                        self._save_metadata()
+                        rows = []
+                    self.metadata = _MetadataColumns.from_rows(rows)
                 except (json.JSONDecodeError, IOError) as e:
                     self.logger.warning(f"Error loading metadata: {str(e)}, reinitializing")
-                    self.metadata = []
-                    self._save_metadata()
+                    self.metadata = _MetadataColumns()
+                self._save_metadata()
+            else:
+                self._save_metadata()
+            self._index_files(0)
             
             # Initialize or load FAISS index
             index_path = os.path.join(self.db_path, "index.faiss")
+            pending_path = os.path.join(self.db_path, "pending.npy")
             if os.path.exists(index_path):
                 try:
-                    self.index = faiss.read_index(index_path)
+                    self.index = self._read_index_mapped(index_path)
+                    if os.path.exists(pending_path):
+                        self._pending_vectors = [np.load(pending_path)]
+                    self._recover_unflushed()
                     self.logger.info(f"Loaded existing vector index with {len(self.metadata)} entries")
+                    if not self._is_configured_type(self.index):
+                        self._rebuild_index()
                 except Exception as e:
                     self.logger.warning(f"Error loading FAISS index: {str(e)}, creating new index")
-                    self.index = faiss.IndexFlatL2(self.dimension)
+                    self.index = self._new_index()
+                    self._index_mapped = False
             else:
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.logger.info("Created new vector index")
+                # Rows logged before the first flush still have their vectors in the vector file
+                self.index = self._new_index()
+                self._recover_unflushed()
+                self.logger.info(f"Created new vector index with {len(self.metadata)} entries")
                 
         except Exception as e:
             self.logger.error(f"Error in _load_or_create_index: {str(e)}")
             # Initialize with empty state
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.metadata = []
+            self.index = self._new_index()
+            self._index_mapped = False
+            self.metadata = _MetadataColumns()
+            self.file_index = {}
+            self._by_file = {}
             self._save_metadata()
     
+    def _recover_unflushed(self):
+        """Replay rows logged after the last flush, re-adding their vectors from the vector file, and drop any leftovers."""
+        indexed = self.index.ntotal + sum(len(batch) for batch in self._pending_vectors)
+        stored = self._stored_vectors()
+        available = len(stored) if stored is not None else 0
+        
+        # Logged rows missing from the saved metadata, up to the last one whose vector reached the index or the vector file
+        rows = []
+        if os.path.exists(self._log_path):
+            with open(self._log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        rows.append(orjson.loads(line))
+                    except orjson.JSONDecodeError:
+                        break
+        rows = [row for row in rows if row.get('id', -1) >= len(self.metadata)]
+        rows = rows[:max(0, max(indexed, available) - len(self.metadata))]
+        end = len(self.metadata) + len(rows)
+        vectors = np.array(stored[indexed:end]) if stored is not None and end > indexed else None
+        del stored
+        
+        # Cut the vector file back to the indexed rows; _add_vectors appends the recovered ones again
+        if available > indexed:
+            os.truncate(self._vectors_path, indexed * self.dimension * np.dtype(np.float32).itemsize)
+        if vectors is not None:
+            self._add_vectors(vectors)
+            self._pending_adds += len(vectors)
+        if rows:
+            start = len(self.metadata)
+            for row in rows:
+                self.metadata.append(row)
+            self._index_files(start)
+            self._pending_adds += len(rows)
+            self.logger.info(f"Recovered {len(rows)} unsaved vector index entries")
+        self.flush()
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
+    
+    def flush(self):
+        """Save the index and metadata if rows were added since the last save, and clear the row log."""
+        if not self._pending_adds:
+            return
+        self._save_index()
+        self._save_metadata()
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
+        self._pending_adds = 0
+    
+    def _read_index_mapped(self, index_path: str):
+        """Read a saved index as a read-only memory map so pages load lazily, or fully if this index type can't be mapped."""
+        # IO_FLAG_MMAP only maps IVF inverted lists; the flat codes behind HNSW and scalar quantizer indexes
+        # need IO_FLAG_MMAP_IFC, which older faiss releases lack
+        if self.index_type == "ivfpq":
+            flag = faiss.IO_FLAG_MMAP
+        else:
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if flag is None:
+            return faiss.read_index(index_path)
+        try:
+            index = faiss.read_index(index_path, flag | faiss.IO_FLAG_READ_ONLY)
+            self._index_mapped = flag != faiss.IO_FLAG_MMAP or isinstance(index, faiss.IndexIVF)
+            return index
+        except Exception as e:
+            self.logger.info(f"Memory-mapped index load failed ({str(e)}), reading it into memory")
+            return faiss.read_index(index_path)
+    
+    def _ensure_writable_index(self):
+        """Swap a memory-mapped index for an in-memory copy before it is modified."""
+        if not self._index_mapped:
+            return
+        self.index = faiss.read_index(os.path.join(self.db_path, "index.faiss"))
+        self._index_mapped = False
+    
+    def _index_files(self, start: int):
+        """Record the rows from start onwards under their path, and in file_index the first file-level row per path."""
+        types = self.metadata.columns.get('type', [_MISSING] * len(self.metadata))
+        for i in range(start, len(self.metadata)):
+            file_path = self.metadata.file_path(i)
+            self._by_file.setdefault(file_path, []).append(i)
+            if types[i] == 'file':
+                self.file_index.setdefault(file_path, i)
+    
+    def _stored_vectors(self) -> Optional[np.ndarray]:
+        """Memory-map the normalized vectors saved in row order, or None if there are none."""
+        if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) == 0:
+            return None
+        return np.memmap(self._vectors_path, dtype=np.float32, mode='r').reshape(-1, self.dimension)
+    
+    def _new_index(self):
+        """Create an empty inner-product index of the configured type; over unit-length vectors it ranks by cosine."""
+        if self.index_type == "ivfpq":
+            # Compressed codes for large method corpora; needs training before vectors can be added
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFPQ(quantizer, self.dimension, IVFPQ_NLIST, IVFPQ_M, IVFPQ_NBITS,
+                                     faiss.METRIC_INNER_PRODUCT)
+            index.nprobe = IVFPQ_NPROBE
+            return index
+        if self.index_type in SQ_TYPES:
+            return faiss.IndexScalarQuantizer(self.dimension, SQ_TYPES[self.index_type], faiss.METRIC_INNER_PRODUCT)
+        
+        # HNSW is searched in roughly log(N) steps instead of scanning every vector
+        index = faiss.IndexHNSWFlat(self.dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+    
+    def _is_configured_type(self, index) -> bool:
+        """Check whether a loaded index matches index_type and uses the inner-product metric."""
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return False
+        if self.index_type == "ivfpq":
+            return isinstance(index, faiss.IndexIVFPQ)
+        if self.index_type in SQ_TYPES:
+            return isinstance(index, faiss.IndexScalarQuantizer) and index.sq.qtype == SQ_TYPES[self.index_type]
+        return isinstance(index, faiss.IndexHNSWFlat)
+    
+    def _rebuild_index(self):
+        """Rebuild a saved index of another type (e.g. an older flat one), keeping vector order so metadata ids still match."""
+        self._ensure_writable_index()
+        batches = []
+        stored = self._stored_vectors()
+        if stored is not None and len(stored) == self.index.ntotal + sum(len(batch) for batch in self._pending_vectors):
+            # The saved copy is exact, unlike vectors reconstructed from a compressed index, and already
+            # includes the pending ones
+            batches.append(np.array(stored))
+            self._pending_vectors = []
+        elif self.index.ntotal:
+            if isinstance(self.index, faiss.IndexIVF):
+                self.index.make_direct_map()
+            batches.append(self.index.reconstruct_n(0, self.index.ntotal))
+        batches.extend(self._pending_vectors)
+        self._pending_vectors = []
+        self.index = self._new_index()
+        self._index_mapped = False
+        if os.path.exists(self._vectors_path):
+            os.remove(self._vectors_path)
+        if batches:
+            self._add_vectors(np.vstack(batches))
+        self._save_index()
+        self.logger.info(f"Rebuilt vector index as {self.index_type} with {len(self.metadata)} entries")
+    
+    def _add_vectors(self, vectors: np.ndarray):
+        """Normalize and add vectors to the index; an untrained IVFPQ or 8-bit index buffers them until IVFPQ_TRAIN_SIZE are available."""
+        self._ensure_writable_index()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        with open(self._vectors_path, 'ab') as f:
+            f.write(vectors.tobytes())
+        if self.index.is_trained:
+            self.index.add(vectors)
+            return
+        
+        self._pending_vectors.append(vectors)
+        if sum(len(batch) for batch in self._pending_vectors) >= IVFPQ_TRAIN_SIZE:
+            training = np.vstack(self._pending_vectors)
+            self.index.train(training)
+            self.index.add(training)
+            self._pending_vectors = []
+            self.logger.info(f"Trained vector index on {len(training)} vectors")
+    
     def _save_metadata(self):
-        """Save metadata to disk."""
+        """Save metadata to disk as columns."""
         try:
-            metadata_path = os.path.join(self.db_path, "metadata.json")
-            with open(metadata_path, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            columns_path = os.path.join(self.db_path, "metadata.columns.json")
+            with open(columns_path, 'wb') as f:
+                f.write(orjson.dumps(self.metadata.to_dict()))
         except Exception as e:
             self.logger.error(f"Error saving metadata: {str(e)}")
     
     def _save_index(self):
         """Save FAISS index to disk."""
+        if self._index_mapped:
+            # Still the unmodified file on disk; rewriting it in place would break the mapping
+            return
         try:
             index_path = os.path.join(self.db_path, "index.faiss")
             faiss.write_index(self.index, index_path)
+            
+            # Vectors still waiting for training are kept alongside so their metadata ids stay valid
+            pending_path = os.path.join(self.db_path, "pending.npy")
+            if self._pending_vectors:
+                np.save(pending_path, np.vstack(self._pending_vectors))
+            elif os.path.exists(pending_path):
+                os.remove(pending_path)
         except Exception as e:
             self.logger.error(f"Error saving FAISS index: {str(e)}")
     
     def add_file(self, file_path: str, content: str, language: str, summary: str, detailed_summary: str, methods: List[Dict[str, Any]], imports: List[str]):
         """Add a file to the vector database."""
+        return self.add_files_bulk([{
+            'file_path': file_path,
+            'content': content,
+            'language': language,
+            'summary': summary,
+            'detailed_summary': detailed_summary,
+            'methods': methods,
+            'imports': imports
+        }])
+    
+    def add_files_bulk(self, files: List[Dict[str, Any]]) -> bool:
+        """Add files (add_file's arguments as dicts) with one encode batch and one index add."""
         try:
-            # Create embeddings for file-level content
-            file_embedding = self.model.encode([content])[0]
-            
-            # Create embeddings for methods
-            method_embeddings = []
-            method_metadata = []
-            
-            for method in methods:
-                method_text = f"{method['name']} ({method['type']}): {method['summary']}"
-                method_embedding = self.model.encode([method_text])[0]
-                method_embeddings.append(method_embedding)
-                method_metadata.append({
-                    'file_path': file_path,
-                    'method_name': method['name'],
-                    'method_type': method['type'],
-                    'line_numbers': method['line_numbers'],
-                    'summary': method['summary']
+            # Collect file-level content and method texts, with the metadata of each row
+            texts = []
+            entries = []
+            for file in files:
+                texts.append(file['content'])
+                entries.append({
+                    'file_path': file['file_path'],
+                    'language': file['language'],
+                    'summary': file['summary'],
+                    'detailed_summary': file['detailed_summary'],
+                    'is_method': False
                 })
+                for method in file['methods']:
+                    texts.append(f"{method['name']} ({method['type']}): {method['summary']}")
+                    entries.append({
+                        'file_path': file['file_path'],
+                        'method_name': method['name'],
+                        'method_type': method['type'],
+                        'line_numbers': method['line_numbers'],
+                        'summary': method['summary'],
+                        'is_method': True
+                    })
             
-            # Add file embedding to index
-            self.index.add(np.array([file_embedding], dtype=np.float32))
-            
-            # Add method embeddings to index
-            if method_embeddings:
-                self.index.add(np.array(method_embeddings, dtype=np.float32))
-            
-            # Update metadata
-            self.metadata.append({
-                'id': len(self.metadata),
-                'file_path': file_path,
-                'language': language,
-                'summary': summary,
-                'detailed_summary': detailed_summary,
-                'is_method': False
-            })
-            
-            # Add method metadata
-            for i, metadata in enumerate(method_metadata):
-                self.metadata.append({
-                    'id': len(self.metadata),
-                    'file_path': metadata['file_path'],
-                    'method_name': metadata['method_name'],
-                    'method_type': metadata['method_type'],
-                    'line_numbers': metadata['line_numbers'],
-                    'summary': metadata['summary'],
-                    'is_method': True
-                })
-            
-            # Save the updated index and metadata
-            self._save_index()
-            self._save_metadata()
-            
+            self._add_entries(texts, entries)
             return True
         except Exception as e:
-            self.logger.error(f"Error adding file to vector database: {str(e)}")
+            self.logger.error(f"Error adding files to vector database: {str(e)}")
             return False
     
+    def _add_entries(self, texts: List[str], entries: List[Dict[str, Any]]):
+        """Embed texts in one batch and add them to the index and metadata in order, saving both every FLUSH_THRESHOLD rows."""
+        if not texts:
+            return
+        embeddings = self.model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+        self._add_vectors(np.asarray(embeddings, dtype=np.float32))
+        start = len(self.metadata)
+        for entry in entries:
+            self.metadata.append({'id': len(self.metadata), **entry})
+        self._index_files(start)
+        
+        # Log the new rows so they survive a crash before the next flush, then save everything once enough accumulated
+        with open(self._log_path, 'ab') as f:
+            f.write(b''.join(orjson.dumps(self.metadata[i]) + b'\n' for i in range(start, len(self.metadata))))
+        self._pending_adds += len(entries)
+        if self._pending_adds >= FLUSH_THRESHOLD:
+            self.flush()
+    
     def search(self, query: str, k: int = 5) -> List[Dict[str, any]]:
         """Search for relevant code snippets and methods."""
         try:
-            # Create query embedding
-            query_embedding = self.model.encode([query])[0]
+            # Create query embedding, unit length like the stored vectors
+            query_embedding = encode_query(self.model, query)
             
-            # Search the index
-            distances, indices = self.index.search(
+            # Search the index; until an IVFPQ or sq8 index is trained every vector is still buffered, so scan those exactly
+            if self._pending_vectors:
+                index = faiss.IndexFlatIP(self.dimension)
+                index.add(np.vstack(self._pending_vectors))
+            else:
+                index = self.index
+                if isinstance(index, faiss.IndexHNSWFlat):
+                    index.hnsw.efSearch = HNSW_EF_SEARCH
+                elif isinstance(index, faiss.IndexIVF):
+                    index.nprobe = IVFPQ_NPROBE
+            distances, indices = index.search(
                 np.array([query_embedding]).astype('float32'), k
             )
             
-            # Get results with metadata
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.metadata):
-                    result = self.metadata[idx].copy()
-                    result['relevance_score'] = float(1 / (1 + distances[0][i]))  # Convert distance to similarity score
-                    results.append(result)
+            # Get results with metadata; faiss pads missing results with -1, and the inner product
+            # of unit vectors is already the cosine similarity
+            ids = indices[0]
+            valid = (ids >= 0) & (ids < len(self.metadata))
+            results = self.metadata.take(ids[valid].tolist())
+            for result, score in zip(results, distances[0][valid].tolist()):
+                result['relevance_score'] = score
             
             return results
             
@@ -174,17 +601,14 @@ class VectorDB:
     def get_file_content(self, file_path: str) -> Optional[Dict[str, any]]:
         """Get all embeddings and metadata for a file."""
         try:
-            file_entries = [entry for entry in self.metadata if entry['file_path'] == file_path]
-            if not file_entries:
-                return None
-            
             # Find the file-level entry
-            file_entry = next((entry for entry in file_entries if entry['type'] == 'file'), None)
-            if not file_entry:
+            file_id = self.file_index.get(file_path)
+            if file_id is None:
                 return None
+            file_entry = self.metadata[file_id]
             
             # Get all method entries
-            method_entries = [entry for entry in file_entries if entry['type'] == 'method']
+            method_entries = [entry for entry in self.metadata.take(self._by_file[file_path]) if entry.get('type') == 'method']
             
             return {
                 "file_path": file_path,
@@ -200,40 +624,43 @@ class VectorDB:
     
     def add_document(self, file_path: str, content: str, metadata: Dict[str, Any]) -> bool:
         """Add a document to the vector database."""
+        return self.add_documents_bulk([{'file_path': file_path, 'content': content, 'metadata': metadata}])
+    
+    def add_documents_bulk(self, documents: List[Dict[str, Any]]) -> bool:
+        """Add documents (dicts of add_document's arguments) with one encode batch and one index add."""
         try:
-            # Validate inputs
-            if not file_path:
-                self.logger.error("File path is required")
-                return False
+            texts = []
+            entries = []
+            all_valid = True
+            for document in documents:
+                file_path = document.get('file_path')
+                content = document.get('content')
+                metadata = document.get('metadata')
                 
-            if not content:
-                self.logger.warning(f"No content provided for file {file_path}, using empty string")
-                content = ""
+                # Validate inputs
+                if not file_path:
+                    self.logger.error("File path is required")
+                    all_valid = False
+                    continue
+                    
+                if not content:
+                    self.logger.warning(f"No content provided for file {file_path}, using empty string")
+                    content = ""
+                    
+                if not metadata:
+                    self.logger.warning(f"No metadata provided for file {file_path}")
+                    metadata = {}
                 
-            if not metadata:
-                self.logger.warning(f"No metadata provided for file {file_path}")
-                metadata = {}
-            
-            # Create embedding for the content
-            embedding = self.model.encode([content])[0]
-            
-            # Add embedding to index
-            self.index.add(np.array([embedding], dtype=np.float32))
-            
-            # Update metadata
-            self.metadata.append({
-                'id': len(self.metadata),
-                'file_path': file_path,
-                'content': content,
-                'type': metadata.get('type', 'file'),
-                **metadata
-            })
-            
-            # Save the updated index and metadata
-            self._save_index()
-            self._save_metadata()
+                texts.append(content)
+                entries.append({
+                    'file_path': file_path,
+                    'content': content,
+                    'type': metadata.get('type', 'file'),
+                    **metadata
+                })
             
-            return True
+            self._add_entries(texts, entries)
+            return all_valid
         except Exception as e:
-            self.logger.error(f"Error adding document to vector database: {str(e)}")
-            return False 
\ No newline at end of file
+            self.logger.error(f"Error adding documents to vector database: {str(e)}")
+            return False
@@ -0,0 +1,103 @@
+import hashlib
+import os
+
+import numpy as np
+import orjson
+import pytest
+
+from src.backend import vector_db
+from src.backend.vector_db import FLUSH_THRESHOLD, VectorDB, _MetadataColumns
+
+
+class _HashEncoder:
+    """Deterministic stand-in for the embedding model: each text maps to a fixed random vector."""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.md5(text.encode()).digest()[:4], 'little')).standard_normal(384)
+            for text in texts
+        ]).astype(np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture(autouse=True)
+def hash_encoder(monkeypatch):
+    monkeypatch.setattr(vector_db, 'load_embedding_model', lambda name='all-MiniLM-L6-v2': _HashEncoder())
+
+
+def _file(i, methods=0):
+    return {
+        'file_path': f'src/file_{i}.py',
+        'content': f'content of file {i}',
+        'language': 'python',
+        'summary': f'summary {i}',
+        'detailed_summary': f'detailed summary {i}',
+        'methods': [{'name': f'fn_{j}', 'type': 'function', 'line_numbers': [j, j + 2], 'summary': f'does {j}'}
+                    for j in range(methods)],
+        'imports': []
+    }
+
+
+ROWS = [
+    {'id': 0, 'file_path': 'a.py', 'summary': 's', 'is_method': False},
+    {'id': 1, 'file_path': 'a.py', 'method_name': 'f', 'line_numbers': [1, 3], 'is_method': True},
+    {'file_path': 'b.py', 'summary': None},
+    {'id': 3, 'method_name': 'g'},
+]
+
+
+def test_metadata_columns_round_trip():
+    store = _MetadataColumns.from_rows(ROWS)
+    restored = _MetadataColumns.from_dict(orjson.loads(orjson.dumps(store.to_dict())))
+
+    assert list(restored) == ROWS
+    assert restored.take([3, 0]) == [ROWS[3], ROWS[0]]
+    assert [restored.file_path(i) for i in range(len(ROWS))] == ['a.py', 'a.py', 'b.py', None]
+    assert restored.paths == ['a.py', 'b.py']
+
+
+def test_metadata_columns_append_after_load():
+    restored = _MetadataColumns.from_dict(_MetadataColumns.from_rows(ROWS[:2]).to_dict())
+    restored.append(ROWS[2])
+    restored.append(ROWS[3])
+
+    assert list(restored) == ROWS
+
+
+@pytest.mark.parametrize('flush_first', [False, True])
+def test_recover_unflushed_rows(tmp_path, flush_first):
+    db = VectorDB(db_path=str(tmp_path))
+    if flush_first:
+        db.add_files_bulk([_file(0, methods=FLUSH_THRESHOLD)])
+    flushed = len(db.metadata)
+    db.add_files_bulk([_file(1, methods=5), _file(2, methods=2)])
+    expected = list(db.metadata)
+    assert len(expected) == flushed + 9
+    assert os.path.exists(os.path.join(tmp_path, 'metadata.pending.jsonl'))
+
+    # Reopen without flushing, as after a crash
+    vector_db._open_dbs.discard(db)
+    recovered = VectorDB(db_path=str(tmp_path))
+
+    assert list(recovered.metadata) == expected
+    assert recovered.index.ntotal == len(expected)
+    assert recovered._by_file['src/file_2.py'] == [flushed + 6, flushed + 7, flushed + 8]
+    assert not os.path.exists(os.path.join(tmp_path, 'metadata.pending.jsonl'))
+    assert recovered.search('content of file 1', k=1)[0]['file_path'] == 'src/file_1.py'
+
+
+def test_recover_drops_rows_without_vectors(tmp_path):
+    db = VectorDB(db_path=str(tmp_path))
+    db.add_files_bulk([_file(0, methods=2)])
+    vector_db._open_dbs.discard(db)
+
+    # A torn write of the vector file leaves the last logged row without its vector
+    vectors_path = os.path.join(tmp_path, 'embeddings.f32')
+    os.truncate(vectors_path, os.path.getsize(vectors_path) - 384 * 4)
+    recovered = VectorDB(db_path=str(tmp_path))
+
+    assert len(recovered.metadata) == 2
+    assert recovered.index.ntotal == 2
+    assert os.path.getsize(vectors_path) == 2 * 384 * 4